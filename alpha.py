@@ -1,240 +1,232 @@
 import datetime
-import pandas as pd
-from bs4 import BeautifulSoup
-from helium import start_chrome, write, click, S, find_all, get_driver
+import json
+from selenium.webdriver.common.by import By
 import time
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, Response, request, send_file, jsonify, stream_with_context
 import logging
+import os
 import re
-from difflib import SequenceMatcher
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from urllib.parse import quote_plus, urlencode, urljoin
+
+import config
+import http_fetch
+import matching
+import metrics
+from metrics import STAGE_SECONDS
+from browser_pool import pool as browser_pool
+from checkpoint import CheckpointStore
+from circuit_breaker import SourceUnavailable, breakers
+from dedup import StreamingDeduper
+from input_reader import count_input_rows, iter_input_batches
+from preprocess import prepare_input_batch
+from rate_limit import backoff_delay, limiter
+from result_writer import StreamingResultWriter
+from jobs import JobManager
+from parsing import parse_classification_listings, parse_fvlb_detail
+from lookup_cache import Uncacheable, cached_lookup, single_flight
+from mirror import mirror
+from search_cache import SearchCache
+from waits import get_wait_stats, settled, wait_until
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 output_file_path = 'movie_ratings.xlsx'
 
-def string_similarity(str1, str2):
-    return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
-
-def wait_for_element(selector, timeout=10):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        if selector.exists():
-            return True
-        time.sleep(0.5)
-    return False
+def wait_for_element(browser, selector, step, timeout=None):
+    return wait_until(lambda: browser.find_elements(By.CSS_SELECTOR, selector), step, timeout=timeout)
 
 def is_valid_director_name(name):
     return bool(name) and re.match("^[a-zA-Z ]+$", name)
 
 
-def get_movie_details_from_website(movie_name, director_name,release_year, retries=1, similarity_threshold=0.8235):
-    base_url = "https://www.classificationoffice.govt.nz/find-a-rating/?search="
-    search_url = base_url + movie_name.replace(" ", "+")
-
-    for attempt in range(retries):
-        try:
-            browser = start_chrome(search_url, headless=True)
-            time.sleep(5)  # Wait for the page to load
-            page_source = browser.page_source
-            soup = BeautifulSoup(page_source, 'html.parser')
-            listings = soup.find_all('div', {'data-listing': ''})
-
-            for listing in listings:
-                title_tag = listing.find('h3', class_='h2')
-                if not title_tag:
-                    continue
-                title = title_tag.get_text(strip=True)
+class LookupCancelled(Exception):
+    """A hedged lookup was abandoned because the other source already answered."""
+
+class LookupFailed(Exception):
+    """Every attempt at a source raised, so there is no answer from the site to report or cache."""
+
+def check_cancelled(cancel):
+    if cancel is not None and cancel.is_set():
+        raise LookupCancelled()
+
+def classification_search_url(movie_name):
+    return config.CLASSIFICATION_SEARCH_URL + '?' + urlencode({'search': movie_name})
+
+def has_listing_markup(page_source):
+    return 'data-listing' in page_source
+
+def is_no_results_page(page_source):
+    # Only a marker copied from a saved page of the live site is trusted; an
+    # empty results container may just be waiting for JavaScript to fill it
+    return bool(config.CLASSIFICATION_NO_RESULTS_MARKER) and config.CLASSIFICATION_NO_RESULTS_MARKER in page_source
+
+def fetch_classification_search_page(search_url, fetch_mode):
+    if fetch_mode == 'http':
+        with STAGE_SECONDS.time(source='classificationoffice', stage='http_fetch'):
+            page_source = http_fetch.fetch(search_url)
+        if has_listing_markup(page_source) or is_no_results_page(page_source):
+            return page_source
+        logging.info(f"No listing markup in HTTP response for {search_url}, falling back to browser")
+
+    with browser_pool.browser() as browser, STAGE_SECONDS.time(source='classificationoffice', stage='browser_fetch'):
+        limiter.acquire(search_url)
+        browser.get(search_url)
+        listed = wait_for_element(browser, 'div[data-listing]', 'classification_listings')
+        page_source = browser.page_source
+        if not listed and not is_no_results_page(page_source):
+            # Still rendering, or a miss we cannot tell from one: report no
+            # match, but neither cache it nor count it for or against the source
+            raise Uncacheable(None)
+        return page_source
+
+def match_classification_listings(listings, movie_name, director_name, release_year, search_url,
+                                  similarity_threshold=matching.CLASSIFICATION_PARTIAL_THRESHOLD):
+    for listing in listings:
+        director_text = listing['director_text']
+
+        if director_name.lower() in director_text.lower() and listing['release_year'] == release_year:
+            return {
+                'movie_name': movie_name,
+                'director_name': director_name,
+                'classification': listing['classification'],
+                'release_year': release_year,
+                'run_time': listing['run_time'],
+                'label_issued_by': listing['label_issued_by'],
+                'label_issued_on': listing['label_issued_on'],
+                'MR': listing['MR'],
+                'CD': listing['classification'],
+                'link': search_url,
+                'comment': 'Found as Direct Search'
+            }
 
-                director_tag = listing.find('p', class_='small')
-                if not director_tag:
-                    continue
-                director_text = director_tag.get_text(strip=True)
-
-                # Extract release year and director name from the text
-                release_year_found = re.search(r'(\d{4})', director_text)
-                release_year_extracted = release_year_found.group(1) if release_year_found else 'N/A'
-
-                if director_name.lower() in director_text.lower() and release_year_extracted == release_year:
-                    classification_tag = listing.find('p', class_='large mb-2')
-                    classification = classification_tag.get_text(strip=True) if classification_tag else 'N/A'
-
-                    mr_tag = listing.find('p', class_='large')
-                    mr_text = mr_tag.get_text(strip=True) if mr_tag else 'N/A'
-
-                    table = listing.find('table', class_='rating-result-table')
-                    run_time = 'N/A'
-                    label_issued_by = 'N/A'
-                    label_issued_on = 'N/A'
-                    if table:
-                        lines = table.get_text(separator="\n", strip=True).split('\n')
-                        for i, line in enumerate(lines):
-                            if 'Running time:' in line:
-                                run_time = lines[i + 1].strip()
-                            elif 'Label issued by:' in line:
-                                label_issued_by = lines[i + 1].strip()
-                            elif 'Label issued on:' in line:
-                                label_issued_on = lines[i + 1].strip()
-
-                    browser.quit()
-                    return {
-                        'movie_name': movie_name,
-                        'director_name': director_name,
-                        'classification': classification,
-                        'release_year': release_year,
-                        'run_time': run_time,
-                        'label_issued_by': label_issued_by,
-                        'label_issued_on': label_issued_on,
-                        'MR': mr_text,
-                        'CD': classification,
-                        'link': search_url,
-                        'Comment': 'Found as Direct search'
-                    }
-
-                # Partial matching fallback
-                if string_similarity(movie_name, title) >= similarity_threshold and string_similarity(director_name, director_text) >= similarity_threshold:
-                    browser.quit()
-                    return {
-                        'movie_name': movie_name,
-                        'director_name': director_name,
-                        'classification': 'N/A',
-                        'release_year': release_year_extracted,
-                        'run_time': 'N/A',
-                        'label_issued_by': 'N/A',
-                        'label_issued_on': 'N/A',
-                        'MR': 'N/A',
-                        'CD': 'N/A',
-                        'link': search_url,
-                        'Comment': 'Need Manual Verification'
-                    }
-            browser.quit()
-        except Exception as e:
-            logging.error(f"Error fetching details for {movie_name} (attempt {attempt+1}/{retries}): {e}")
-            time.sleep(5)  # Wait before retrying
+    # Partial matching fallback: score every listing and keep the one whose
+    # weaker score (title or director) is highest
+    title_scores = matching.score_many(movie_name, [listing['title'] for listing in listings], similarity_threshold)
+    director_scores = matching.score_many(director_name, [listing['director_text'] for listing in listings],
+                                          similarity_threshold)
+    candidates = [
+        (min(title_score, director_score), index)
+        for index, (title_score, director_score) in enumerate(zip(title_scores, director_scores))
+        if title_score >= similarity_threshold and director_score >= similarity_threshold
+    ]
+    if candidates:
+        listing = listings[max(candidates)[1]]
+        return {
+            'movie_name': movie_name,
+            'director_name': director_name,
+            'classification': 'N/A',
+            'release_year': listing['release_year'],
+            'run_time': 'N/A',
+            'label_issued_by': 'N/A',
+            'label_issued_on': 'N/A',
+            'MR': 'N/A',
+            'CD': 'N/A',
+            'link': search_url,
+            'comment': 'Need Manual Verification'
+        }
     return None
 
-def get_movie_details_from_nz_website(movie_name, director_name, release_year, retries=1):
-    from difflib import SequenceMatcher  # For string similarity
+def get_movie_details_from_website(movie_name, director_name,release_year, retries=None, similarity_threshold=matching.CLASSIFICATION_PARTIAL_THRESHOLD, fetch_mode=None, search_cache=None, cancel=None):
+    search_url = classification_search_url(movie_name)
+    fetch_mode = fetch_mode or config.FETCH_MODE
 
-    base_url = "https://www.fvlb.org.nz/"
-    browser = start_chrome(base_url, headless=True)
-
-    def string_similarity(a, b):
-        """Calculate string similarity using SequenceMatcher."""
-        return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+    def fetch_listings():
+        page_source = fetch_classification_search_page(search_url, fetch_mode)
+        with STAGE_SECONDS.time(source='classificationoffice', stage='parse'):
+            listings = parse_classification_listings(page_source)
+        mirror.harvest('classificationoffice', [dict(listing, year=listing['release_year'], link=search_url)
+                                                for listing in listings])
+        return listings
 
+    retries = retries or config.LOOKUP_RETRIES
+    error = None
     for attempt in range(retries):
+        check_cancelled(cancel)
         try:
-            search_title_input = S("#fvlb-input")
-            exact_match_checkbox = S("#ExactSearch")
-            search_button = S(".submitBtn")
-
-            write(movie_name, into=search_title_input)
-            click(exact_match_checkbox)
-            click(search_button)
-
-            if not wait_for_element(S('.result-title')):
-                browser.quit()
-                return {
-                    'movie_name': movie_name,
-                    'director_name': director_name,
-                    'release_year': release_year,
-                    'classification': 'N/A',
-                    'run_time': 'N/A',
-                    'label_issued_by': 'N/A',
-                    'label_issued_on': 'N/A',
-                    'link': 'N/A',
-                    'comment': 'Data not found'
-                }
-
-            time.sleep(3)  # Wait for results to load
-
-            movie_links = find_all(S('.result-title'))
-            best_match = None
-            highest_similarity = 0
-            comment = "Need Manual Verification"
-
-            for link in movie_links:
-                title_text = link.web_element.text.strip()
-                title_similarity = string_similarity(movie_name, title_text)
-
-                if title_similarity >= 0.9:  # Prioritize exact matches
-                    click(link)
-                    time.sleep(1)
-
-                    page_source = get_driver().page_source
-                    soup = BeautifulSoup(page_source, 'html.parser')
-
-                    title_element = soup.find('h1')
-                    title_name = title_element.text.strip() if title_element else 'N/A'
-
-                    director_element = soup.find('div', class_='film-director')
-                    dir_text = director_element.text.strip().replace('Directed by ', '') if director_element else 'N/A'
-                    director_similarity = string_similarity(director_name, dir_text)
-
-                    release_year_text = dir_text.split(",")[0].strip() if ',' in dir_text else 'N/A'
-
-                    if director_similarity >= 0.9 and release_year == release_year_text:
-                        classification_element = soup.find('div', class_='film-classification')
-                        classification = classification_element.text.strip() if classification_element else 'N/A'
-
-                        runtime_element = soup.find_all('div', class_='film-approved')[1]
-                        runtime = runtime_element.text.strip().replace('This title has a runtime of ', '').replace(' minutes.', '')
-
-                        browser.quit()
-                        return {
-                            'movie_name': title_name,
-                            'director_name': dir_text,
-                            'release_year': release_year_text,
-                            'classification': classification,
-                            'run_time': runtime,
-                            'label_issued_by': 'N/A',
-                            'label_issued_on': 'N/A',
-                            'link': browser.current_url,
-                            'comment': 'Found as Direct Search'
-                        }
-                elif title_similarity > highest_similarity:  # Track best partial match
-                    best_match = link
-                    highest_similarity = title_similarity
-
-            if best_match and highest_similarity >= 0.8:  # Consider as partial match
-                click(best_match)
-                time.sleep(1)
-
-                page_source = get_driver().page_source
-                soup = BeautifulSoup(page_source, 'html.parser')
-
-                title_element = soup.find('h1')
-                title_name = title_element.text.strip() if title_element else 'N/A'
-
-                director_element = soup.find('div', class_='film-director')
-                dir_text = director_element.text.strip().replace('Directed by ', '') if director_element else 'N/A'
-                release_year_text = dir_text.split(",")[0].strip() if ',' in dir_text else 'N/A'
-
-                classification_element = soup.find('div', class_='film-classification')
-                classification = classification_element.text.strip() if classification_element else 'N/A'
-
-                runtime_element = soup.find_all('div', class_='film-approved')[1]
-                runtime = runtime_element.text.strip().replace('This title has a runtime of ', '').replace(' minutes.', '')
-
-                browser.quit()
-                return {
-                    'movie_name': title_name,
-                    'director_name': dir_text,
-                    'release_year': release_year_text,
-                    'classification': classification,
-                    'run_time': runtime,
-                    'label_issued_by': 'N/A',
-                    'label_issued_on': 'N/A',
-                    'link': browser.current_url,
-                    'comment': 'Need Manual Verification'
-                }
-
+            if search_cache is not None:
+                listings = search_cache.get_or_fetch(movie_name, fetch_listings)
+            else:
+                listings = fetch_listings()
+            breakers['classificationoffice'].record_success()
+            # The page was read; a miss is an answer, and only errors are retried
+            with STAGE_SECONDS.time(source='classificationoffice', stage='match'):
+                return match_classification_listings(listings, movie_name, director_name, release_year, search_url, similarity_threshold)
+        except (LookupCancelled, Uncacheable):
+            raise
         except Exception as e:
-            logging.error(f"Error fetching details for {movie_name} from NZ website (attempt {attempt+1}/{retries}): {e}")
-            time.sleep(5)  # Wait before retrying
+            error = e
+            breakers['classificationoffice'].record_failure()
+            logging.error(f"Error fetching details for {movie_name} (attempt {attempt+1}/{retries}): {e}")
+            if attempt + 1 < retries:
+                with STAGE_SECONDS.time(source='classificationoffice', stage='retry_backoff'):
+                    time.sleep(backoff_delay(attempt))  # Wait before retrying
+    raise LookupFailed(f"classificationoffice lookup for {movie_name} failed: {error}") from error
+
+def wait_for_detail_page(browser, results_url):
+    return wait_until(
+        lambda: browser.current_url != results_url and browser.find_elements(By.CSS_SELECTOR, 'div.film-director'),
+        'fvlb_detail',
+    )
+
+def fvlb_search_url(movie_name):
+    return config.FVLB_SEARCH_URL_TEMPLATE.format(query=quote_plus(movie_name))
+
+def fvlb_result_href(element):
+    href = element.get_attribute('href')
+    if not href:
+        anchors = element.find_elements(By.CSS_SELECTOR, 'a[href]')
+        href = anchors[0].get_attribute('href') if anchors else None
+    return href
+
+def fetch_fvlb_detail(url):
+    try:
+        with STAGE_SECONDS.time(source='fvlb', stage='detail_http_fetch'):
+            page_source = http_fetch.fetch(url)
+        with STAGE_SECONDS.time(source='fvlb', stage='parse'):
+            return parse_fvlb_detail(page_source)
+    except Exception as e:
+        logging.info(f"HTTP fetch of {url} failed, will use the browser: {e}")
+        return None
+
+def fetch_fvlb_detail_pages(browser, urls, fetch_mode):
+    """Parsed detail pages by URL: fetched concurrently over HTTP, then in `browser` for any HTTP could not read."""
+    details = {}
+    if fetch_mode == 'http':
+        details = dict(zip(urls, fvlb_detail_executor.map(fetch_fvlb_detail, urls)))
+    for url in urls:
+        if details.get(url) is None:
+            with STAGE_SECONDS.time(source='fvlb', stage='detail_browser_fetch'):
+                limiter.acquire(url)
+                browser.get(url)
+                wait_for_element(browser, 'div.film-director', 'fvlb_detail')
+            with STAGE_SECONDS.time(source='fvlb', stage='parse'):
+                details[url] = parse_fvlb_detail(browser.page_source)
+    return details
+
+def harvest_fvlb_details(details):
+    """Add every parsed detail page (by URL) to the mirror, matched or not."""
+    mirror.harvest('fvlb', [dict(detail, year=detail['release_year'], link=url)
+                            for url, detail in details.items() if detail])
+
+def fvlb_movie_details(detail, link, comment):
+    return {
+        'movie_name': detail['title'],
+        'director_name': detail['director_text'],
+        'release_year': detail['release_year'],
+        'classification': detail['classification'],
+        'run_time': detail['run_time'],
+        'label_issued_by': 'N/A',
+        'label_issued_on': 'N/A',
+        'link': link,
+        'comment': comment
+    }
 
-    get_driver().quit()
+def fvlb_not_found(movie_name, director_name, release_year):
     return {
         'movie_name': movie_name,
         'director_name': director_name,
@@ -247,6 +239,121 @@ def get_movie_details_from_nz_website(movie_name, director_name, release_year, r
         'comment': 'Data not found'
     }
 
+def get_movie_details_from_nz_website(movie_name, director_name, release_year, retries=None, cancel=None, fetch_mode=None):
+    fetch_mode = fetch_mode or config.FETCH_MODE
+
+    retries = retries or config.LOOKUP_RETRIES
+    error = None
+    for attempt in range(retries):
+        check_cancelled(cancel)
+        try:
+            with browser_pool.browser() as browser:
+                check_cancelled(cancel)
+                with STAGE_SECONDS.time(source='fvlb', stage='search'):
+                    if config.FVLB_SEARCH_URL_TEMPLATE:
+                        limiter.acquire(fvlb_search_url(movie_name))
+                        browser.get(fvlb_search_url(movie_name))
+                    else:
+                        limiter.acquire(config.FVLB_BASE_URL)
+                        browser.get(config.FVLB_BASE_URL)
+
+                        browser.find_element(By.CSS_SELECTOR, "#fvlb-input").send_keys(movie_name)
+                        browser.find_element(By.CSS_SELECTOR, "#ExactSearch").click()
+                        # Submitting the form is another request to the site
+                        limiter.acquire(config.FVLB_BASE_URL)
+                        browser.find_element(By.CSS_SELECTOR, ".submitBtn").click()
+
+                    selector = '.result-title'
+                    if config.FVLB_NO_RESULTS_SELECTOR:
+                        selector += f', {config.FVLB_NO_RESULTS_SELECTOR}'
+                    answered = wait_for_element(browser, selector, 'fvlb_results')
+                if not answered:
+                    # With a known no-results marker, a page showing neither is a
+                    # hung search. Without one a plain miss looks the same, so it
+                    # is reported but neither cached nor counted for or against FVLB
+                    if config.FVLB_NO_RESULTS_SELECTOR:
+                        raise TimeoutError(f"FVLB search for {movie_name} showed neither results nor a no-results message")
+                    raise Uncacheable(fvlb_not_found(movie_name, director_name, release_year))
+                breakers['fvlb'].record_success()
+                if not browser.find_elements(By.CSS_SELECTOR, '.result-title'):
+                    return fvlb_not_found(movie_name, director_name, release_year)
+
+                # Results can stream in after the first title appears
+                with STAGE_SECONDS.time(source='fvlb', stage='results_settle'):
+                    wait_until(settled(lambda: len(browser.find_elements(By.CSS_SELECTOR, '.result-title'))), 'fvlb_results_settled')
+                results_url = browser.current_url
+
+                result_elements = browser.find_elements(By.CSS_SELECTOR, '.result-title')
+                result_titles = [link.text.strip() for link in result_elements]
+                result_links = [fvlb_result_href(link) for link in result_elements]
+                result_links = [urljoin(results_url, href) if href else None for href in result_links]
+                with STAGE_SECONDS.time(source='fvlb', stage='match'):
+                    # Titles below the partial threshold are of no use either way
+                    title_scores = matching.score_many(movie_name, result_titles, matching.FVLB_PARTIAL_THRESHOLD)
+
+                # Likely exact matches are checked for director and year; the best
+                # of the rest is kept as a partial match
+                exact_candidates = [index for index, score in enumerate(title_scores) if score >= matching.FVLB_EXACT_THRESHOLD]
+                partial_candidates = [index for index, score in enumerate(title_scores) if score < matching.FVLB_EXACT_THRESHOLD]
+                best_match = max(partial_candidates, key=title_scores.__getitem__, default=None)
+                if best_match is not None and title_scores[best_match] < matching.FVLB_PARTIAL_THRESHOLD:
+                    best_match = None
+
+                wanted = exact_candidates + ([best_match] if best_match is not None else [])
+                details = {}
+
+                # Results without a link can only be opened by clicking them
+                for index in wanted:
+                    if result_links[index]:
+                        continue
+                    check_cancelled(cancel)
+                    limiter.acquire(results_url)
+                    browser.find_elements(By.CSS_SELECTOR, '.result-title')[index].click()
+                    wait_for_detail_page(browser, results_url)
+                    result_links[index] = browser.current_url
+                    details[result_links[index]] = parse_fvlb_detail(browser.page_source)
+                    browser.back()
+                    wait_for_element(browser, '.result-title', 'fvlb_results')
+
+                # The rest are fetched all at once rather than clicked through
+                # one navigation at a time
+                check_cancelled(cancel)
+                details.update(fetch_fvlb_detail_pages(
+                    browser, [result_links[index] for index in wanted if result_links[index] not in details], fetch_mode))
+                harvest_fvlb_details(details)
+
+                direct_matches = []
+                for index in exact_candidates:
+                    detail = details.get(result_links[index])
+                    if detail is None:
+                        continue
+                    director_similarity = matching.similarity(director_name, detail['director_text'])
+                    if director_similarity >= matching.FVLB_EXACT_THRESHOLD and release_year == detail['release_year']:
+                        direct_matches.append((title_scores[index] + director_similarity, index))
+                if direct_matches:
+                    index = max(direct_matches)[1]
+                    return fvlb_movie_details(details[result_links[index]], result_links[index], 'Found as Direct Search')
+
+                if best_match is not None and details.get(result_links[best_match]):  # Consider as partial match
+                    return fvlb_movie_details(details[result_links[best_match]], result_links[best_match], 'Need Manual Verification')
+                # The search was read; a miss is an answer, and only errors are retried
+                return fvlb_not_found(movie_name, director_name, release_year)
+
+        except (LookupCancelled, Uncacheable):
+            raise
+        except Exception as e:
+            error = e
+            breakers['fvlb'].record_failure()
+            logging.error(f"Error fetching details for {movie_name} from NZ website (attempt {attempt+1}/{retries}): {e}")
+            if attempt + 1 < retries:
+                with STAGE_SECONDS.time(source='fvlb', stage='retry_backoff'):
+                    time.sleep(backoff_delay(attempt))  # Wait before retrying
+
+    raise LookupFailed(f"fvlb lookup for {movie_name} failed: {error}") from error
+
+# FVLB detail pages fetched over HTTP for all lookups in the process
+fvlb_detail_executor = ThreadPoolExecutor(max_workers=config.FVLB_DETAIL_WORKERS, thread_name_prefix='fvlb-detail')
+
 @app.route('/')
 def index():
     return send_file('index2.html')
@@ -327,94 +434,482 @@ def index():
 #         logging.error(f"Error processing upload: {e}")
 #         return jsonify({'error': 'An error occurred while processing the file. Please try again.'})
 
+# Mapping MR
+mr_mapping = {
+    "Suitable for general audiences": "G",
+    "Parental guidance recommended for younger viewers": "PG",
+    "Suitable for mature audiences": "M",
+    "Unsuitable for audiences under 13 years of age": "13",
+    "Restricted to persons 13 years and over": "R13",
+    "Restricted to persons 13 years and over unless accompanied by a parent or guardian": "RP13",
+    "Restricted to persons 15 years and over": "R15",
+    "Unsuitable for audiences under 16 years of age": "16",
+    "Restricted to persons 16 years and over": "R16",
+    "Restricted to persons 16 years and over unless accompanied by a parent or guardian": "RP16",
+    "Unsuitable for audiences under 18 years of age": "18",
+    "Restricted to persons 18 years and over": "R18",
+    "Restricted to persons 17 years and over unless accompanied by a parent or guardian": "RP18"
+}
+
+def invalid_director_row(movie_name, release_year):
+    return {
+        'movie_name': movie_name,
+        'director_name': 'No Director Details',
+        'release_year': release_year,
+        'classification': 'N/A',
+        'run_time': 'N/A',
+        'label_issued_by': 'N/A',
+        'label_issued_on': 'N/A',
+        'MR': 'N/A',
+        'CD': 'N/A'
+    }
+
+def row_details(details, source, movie_name, director_name, release_year):
+    """`details` for one of the input rows sharing a result, echoing that row's own input where the result does.
+
+    Deduplicated, cached and coalesced results carry the spelling of whichever
+    row was looked up first.
+    """
+    comment = details.get('comment', '')
+    if source == 'classificationoffice':
+        row = dict(details, movie_name=movie_name, director_name=director_name)
+        # A partial match reports the listing's year rather than the input's
+        if comment != 'Need Manual Verification':
+            row['release_year'] = release_year
+        return row
+    if source is None and (comment == 'No Data Found' or comment.startswith('Source Unavailable')):
+        return dict(details, movie_name=movie_name, director_name=director_name, release_year=release_year)
+    return details
+
+def lookup_source(source, lookup, movie_name, director_name, release_year, unavailable, refresh_cache=False, key=None):
+    """cached_lookup through the source's circuit breaker.
+
+    A source that was skipped, or that failed on every attempt, is appended to
+    `unavailable`.
+    """
+    try:
+        return cached_lookup(source, breakers[source].guard(lookup), movie_name, director_name, release_year,
+                             refresh=refresh_cache, key=key)
+    except (SourceUnavailable, LookupFailed):
+        unavailable.append(source)
+        return None
+
+def hedged_lookup(movie_name, director_name, release_year, unavailable, refresh_cache=False, search_cache=None, key=None):
+    """Query both sources at once; returns `(details, source)` like the sequential chain.
+
+    The first direct hit wins and the other lookup is cancelled. Without one,
+    a Classification Office result is preferred over the FVLB one, as in
+    sequential mode.
+    """
+    cancel = threading.Event()
+    futures = {
+        hedge_executor.submit(lookup_source, 'classificationoffice',
+                              partial(get_movie_details_from_website, search_cache=search_cache, cancel=cancel),
+                              movie_name, director_name, release_year, unavailable,
+                              refresh_cache=refresh_cache, key=key): 'classificationoffice',
+        hedge_executor.submit(lookup_source, 'fvlb', partial(get_movie_details_from_nz_website, cancel=cancel),
+                              movie_name, director_name, release_year, unavailable,
+                              refresh_cache=refresh_cache, key=key): 'fvlb',
+    }
+    results = {}
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = futures[future]
+            try:
+                results[source] = future.result()
+            except LookupCancelled:
+                continue
+            except Exception as e:
+                logging.error(f"Hedged {source} lookup failed for {movie_name}: {e}")
+                continue
+            if results[source] and results[source].get('comment') == 'Found as Direct Search':
+                cancel.set()
+                for other in pending:
+                    other.cancel()
+                return results[source], source
+
+    if results.get('classificationoffice'):
+        return results['classificationoffice'], 'classificationoffice'
+    details = results.get('fvlb')
+    if details and details.get('comment') != 'Data not found':
+        return details, 'fvlb'
+    return details, None
+
+def process_row(movie_name, director_name, release_year, refresh_cache=False, search_cache=None, key=None, lookup_mode=None):
+    """Look up one row; returns the output row and the source that answered (or None).
+
+    `lookup_mode` is 'sequential' (FVLB only after a Classification Office
+    miss) or 'hedged' (both at once); it defaults to config.LOOKUP_MODE.
+    """
+    if not is_valid_director_name(director_name):
+        return invalid_director_row(movie_name, release_year), None
+
+    source = None
+    unavailable = []
+    mirrored = None
+    if config.MIRROR_LOOKUP and not refresh_cache:
+        mirrored = mirror.lookup(movie_name, director_name, release_year)
+
+    if mirrored:
+        details, source = mirrored[0], 'mirror'
+    elif (lookup_mode or config.LOOKUP_MODE) == 'hedged':
+        details, source = hedged_lookup(movie_name, director_name, release_year, unavailable,
+                                        refresh_cache=refresh_cache, search_cache=search_cache, key=key)
+    else:
+        details = lookup_source('classificationoffice', partial(get_movie_details_from_website, search_cache=search_cache),
+                                movie_name, director_name, release_year, unavailable, refresh_cache=refresh_cache, key=key)
+        if details:
+            source = 'classificationoffice'
+        else:
+            details = lookup_source('fvlb', get_movie_details_from_nz_website,
+                                    movie_name, director_name, release_year, unavailable, refresh_cache=refresh_cache, key=key)
+            if details and details.get('comment') != 'Data not found':
+                source = 'fvlb'
+
+    # A miss only means "no data" if every source was actually asked
+    if unavailable and source is None:
+        details = {
+            'movie_name': movie_name,
+            'director_name': director_name,
+            'release_year': release_year,
+            'classification': 'N/A',
+            'run_time': 'N/A',
+            'label_issued_by': 'N/A',
+            'label_issued_on': 'N/A',
+            'MR': 'N/A',
+            'CD': 'N/A',
+            'comment': f"Source Unavailable ({', '.join(sorted(unavailable))})"
+        }
+
+    if not details:
+        details = {
+            'movie_name': movie_name,
+            'director_name': director_name,
+            'release_year': release_year,
+            'classification': 'N/A',
+            'run_time': 'N/A',
+            'label_issued_by': 'N/A',
+            'label_issued_on': 'N/A',
+            'MR': 'N/A',
+            'CD': 'N/A',
+        }
+
+    mr_statement = details.get('MR', 'N/A')
+    details['MR'] = mr_mapping.get(mr_statement, mr_statement)
+
+    if details.get('comment') == 'Found as Direct Search':
+        details['comment'] = 'Data Found via Direct Search'
+    elif details.get('comment') == 'Need Manual Verification':
+        details['comment'] = 'Need Manual Verification'
+    elif details.get('comment') == 'Data not found':
+        details['comment'] = 'No Data Found'
+
+    return details, source
+
+def process_row_safely(movie_name, director_name, release_year, **kwargs):
+    # One bad row must not take the rest of the batch down with it
+    try:
+        return process_row(movie_name, director_name, release_year, **kwargs)
+    except Exception as e:
+        logging.error(f"Error processing row for {movie_name}: {e}")
+        return {
+            'movie_name': movie_name,
+            'director_name': director_name,
+            'release_year': release_year,
+            'classification': 'N/A',
+            'run_time': 'N/A',
+            'label_issued_by': 'N/A',
+            'label_issued_on': 'N/A',
+            'MR': 'N/A',
+            'CD': 'N/A',
+            'comment': 'No Data Found'
+        }, None
+
+def process_rows(rows, max_workers=None, refresh_cache=False, on_row=None, lookup_mode=None):
+    """Look up `(key, movie_name, director_name, release_year)` rows concurrently.
+
+    `rows` may be a lazy generator: it is only advanced while fewer than
+    2 * max_workers lookups are in flight, so a huge sheet is never fully
+    materialized. It may also yield None to wait for an in-flight lookup to
+    finish before it reads on. `on_row(key, details, source, latency)` is
+    called on the calling thread as each lookup completes.
+    """
+    max_workers = max(1, min(max_workers or config.MAX_WORKERS, config.MAX_WORKERS))
+    max_in_flight = 2 * max_workers
+    # Rows sharing a title reuse one search for the life of this batch
+    search_cache = SearchCache(refresh=refresh_cache)
+
+    def run(key, movie_name, director_name, release_year):
+        start_time = time.perf_counter()
+        details, source = process_row_safely(movie_name, director_name, release_year,
+                                             refresh_cache=refresh_cache, search_cache=search_cache, key=key,
+                                             lookup_mode=lookup_mode)
+        latency = time.perf_counter() - start_time
+        metrics.ROW_SECONDS.observe(latency, source=source or 'none')
+        return details, source, latency
+
+    in_flight = {}
+
+    def drain_one():
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = in_flight.pop(future)
+            details, source, latency = future.result()
+            if on_row:
+                on_row(key, details, source, latency)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='lookup') as executor:
+        for row in rows:
+            if row is None:
+                if in_flight:
+                    drain_one()
+                continue
+            key, movie_name, director_name, release_year = row
+            while len(in_flight) >= max_in_flight:
+                drain_one()
+            in_flight[executor.submit(run, key, movie_name, director_name, release_year)] = key
+        while in_flight:
+            drain_one()
+
+def job_result_path(job_id, extension='xlsx'):
+    # Absolute, since send_file resolves relative paths against the app's root
+    # rather than the working directory
+    return os.path.join(os.path.abspath(config.JOBS_DIR), f'{job_id}_movie_ratings.{extension}')
+
+def run_upload_job(job):
+    job.start(count_input_rows(job.input_path), restored_hits=checkpoints.source_counts(job.id))
+
+    filename = job_result_path(job.id)
+    writer = StreamingResultWriter(filename, csv_path=job_result_path(job.id, 'csv') if job.options.get('csv') else None)
+    deduper = StreamingDeduper()
+    # (movie_name, director_name, release_year) of rows waiting on an in-flight lookup
+    row_inputs = {}
+
+    def deliver(rows, details, source, latency):
+        """Record one result for `rows`, the (row_index, movie_name, director_name, release_year) inputs sharing it."""
+        results = [(row_index, row_details(details, source, *inputs)) for row_index, *inputs in rows]
+        with STAGE_SECONDS.time(source='job', stage='checkpoint'):
+            checkpoints.save_rows(job.id, [(row_index, row, source) for row_index, row in results])
+        with STAGE_SECONDS.time(source='job', stage='write'):
+            for row_index, row in results:
+                writer.add(row_index, row)
+        job.record_row([row_index for row_index, _ in results], details.get('comment', 'N/A'), source, latency)
+        metrics.ROWS.inc(len(results), comment=details.get('comment', 'N/A'), source=source or 'none')
+
+    def on_row(key, details, source, latency):
+        # Fan each unique result back out to every row that shares its key
+        rows = [(row_index,) + row_inputs.pop(row_index) for row_index in deduper.complete(key, details, source)]
+        deliver(rows, details, source, latency)
+
+    def wait_for_writer():
+        # Rows answered without a lookup of their own queue up in the writer
+        # behind any earlier row still being looked up (rows joined to an
+        # in-flight lookup land there all at once when it finishes); let
+        # lookups finish before reading on
+        if writer.backlog + deduper.joined_waiting >= config.RESULT_BUFFER_ROWS:
+            yield None
+
+    def pending_rows():
+        rows_read = 0
+        for batch in iter_input_batches(job.input_path):
+            with STAGE_SECONDS.time(source='job', stage='preprocess'):
+                batch = prepare_input_batch(batch)
+
+            # Rows checkpointed by an earlier, interrupted run of this job are not looked up again
+            completed = checkpoints.load_rows(job.id, batch.index[0], batch.index[-1] + 1)
+            for row_index, (details, source) in completed.items():
+                yield from wait_for_writer()
+                writer.add(row_index, details)
+
+            for row_index, movie_name, director_name, release_year, valid_director, key in zip(
+                    batch.index.tolist(), batch['Movie_name'], batch['Director_name'], batch['Release_year'],
+                    batch['valid_director'], batch['lookup_key']):
+                if row_index in completed:
+                    continue
+                if not valid_director:
+                    # Flagged in bulk by prepare_input_batch; nothing to look up
+                    yield from wait_for_writer()
+                    deliver([(row_index, movie_name, director_name, release_year)],
+                            invalid_director_row(movie_name, release_year), None, 0.0)
+                    continue
+                yield from wait_for_writer()
+                outcome = deduper.add(key, row_index)
+                if outcome in ('lookup', 'joined'):
+                    row_inputs[row_index] = (movie_name, director_name, release_year)
+                if outcome == 'lookup':
+                    yield key, movie_name, director_name, release_year
+                elif outcome != 'joined':
+                    details, source = outcome
+                    deliver([(row_index, movie_name, director_name, release_year)], details, source, 0.0)
+
+            rows_read += len(batch)
+            job.update_progress(dedup=deduper.stats())
+        job.update_progress(rows_total=rows_read)
+
+    process_rows(pending_rows(),
+                 max_workers=job.options.get('max_workers'),
+                 refresh_cache=job.options.get('refresh_cache', False),
+                 on_row=on_row,
+                 lookup_mode=job.options.get('lookup_mode'))
+
+    with STAGE_SECONDS.time(source='job', stage='finalize'):
+        writer.close()
+    checkpoints.set_status(job.id, 'done')
+    return filename
+
+checkpoints = CheckpointStore()
+job_manager = JobManager(run_upload_job)
+# Hedged lookups run both sources here, apart from the per-job row executors
+# that wait on them
+hedge_executor = ThreadPoolExecutor(max_workers=config.HEDGE_WORKERS, thread_name_prefix='hedge')
+
+# Gauges over state owned elsewhere, read only when /metrics is scraped
+BREAKER_STATE_VALUES = {'closed': 0, 'half_open': 1, 'open': 2}
+metrics.Gauge('nz_automate_browsers_in_use', 'Pooled browsers checked out by lookups', function=lambda: browser_pool.in_use)
+metrics.Gauge('nz_automate_browsers_rss_bytes', 'Last measured resident memory of all pooled browsers',
+              function=lambda: sum(browser['rss_mb'] for browser in browser_pool.stats()['browsers']) * 1024 * 1024)
+metrics.Gauge('nz_automate_jobs', 'Upload jobs in this process by status', ['status'],
+              function=lambda: {(status,): count for status, count in job_manager.status_counts().items()})
+metrics.Gauge('nz_automate_source_breaker_state', 'Circuit breaker state per source (0 closed, 1 half open, 2 open)',
+              ['source'], function=lambda: {(source,): BREAKER_STATE_VALUES[breaker.state] for source, breaker in breakers.items()})
+metrics.Gauge('nz_automate_rate_limit_requests_per_second', 'Current request rate allowed per host', ['host'],
+              function=lambda: {(host,): stats['rate'] for host, stats in limiter.stats().items()})
+metrics.Gauge('nz_automate_mirror_records', 'Records in the local classification mirror', function=lambda: mirror.stats()['records'])
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     try:
         file = request.files['file']
         if file.filename.endswith('.xlsx'):
-            df = pd.read_excel(file)
-            
-            df['Movie_name'] = df['Movie_name'].fillna('').astype(str)
-            df['Director_name'] = df['Director_name'].fillna('').astype(str)
-            df['Release_year'] = df['Release_year'].fillna('').astype(str)
-
-            movie_names = df['Movie_name'].tolist()
-            director_names = df['Director_name'].tolist()
-            release_years = df['Release_year'].tolist()
-
-            # Mapping MR
-            mr_mapping = {
-                "Suitable for general audiences": "G",
-                "Parental guidance recommended for younger viewers": "PG",
-                "Suitable for mature audiences": "M",
-                "Unsuitable for audiences under 13 years of age": "13",
-                "Restricted to persons 13 years and over": "R13",
-                "Restricted to persons 13 years and over unless accompanied by a parent or guardian": "RP13",
-                "Restricted to persons 15 years and over": "R15",
-                "Unsuitable for audiences under 16 years of age": "16",
-                "Restricted to persons 16 years and over": "R16",
-                "Restricted to persons 16 years and over unless accompanied by a parent or guardian": "RP16",
-                "Unsuitable for audiences under 18 years of age": "18",
-                "Restricted to persons 18 years and over": "R18",
-                "Restricted to persons 17 years and over unless accompanied by a parent or guardian": "RP18"
+            job_id = uuid.uuid4().hex
+            os.makedirs(config.JOBS_DIR, exist_ok=True)
+            input_path = os.path.join(config.JOBS_DIR, f'{job_id}_upload.xlsx')
+            with STAGE_SECONDS.time(source='upload', stage='save'):
+                file.save(input_path)
+
+            options = {
+                'max_workers': request.form.get('max_workers', type=int),
+                'refresh_cache': request.form.get('refresh_cache', '').lower() in ('1', 'true', 'on', 'yes'),
+                'csv': request.form.get('csv', '').lower() in ('1', 'true', 'on', 'yes'),
+                'lookup_mode': request.form.get('lookup_mode') or config.LOOKUP_MODE,
             }
-
-            results = []
-            for movie_name, director_name, release_year in zip(movie_names, director_names, release_years):
-                if not is_valid_director_name(director_name):
-                    results.append({
-                        'movie_name': movie_name,
-                        'director_name': 'No Director Details',
-                        'release_year': release_year,
-                        'classification': 'N/A',
-                        'run_time': 'N/A',
-                        'label_issued_by': 'N/A',
-                        'label_issued_on': 'N/A',
-                        'MR': 'N/A',
-                        'CD': 'N/A'
-                    })
-                    continue
-
-                details = get_movie_details_from_website(movie_name, director_name, release_year)
-                if not details:
-                    details = get_movie_details_from_nz_website(movie_name, director_name, release_year)
-
-                if not details:
-                    details = {
-                        'movie_name': movie_name,
-                        'director_name': director_name,
-                        'release_year': release_year,
-                        'classification': 'N/A',
-                        'run_time': 'N/A',
-                        'label_issued_by': 'N/A',
-                        'label_issued_on': 'N/A',
-                        'MR': 'N/A',
-                        'CD': 'N/A',
-                    }
-                
-                mr_statement = details.get('MR', 'N/A')
-                details['MR'] = mr_mapping.get(mr_statement, mr_statement)  
-
-                if details['comment'] == 'Found as Direct Search':
-                    details['comment'] = 'Data Found via Direct Search'
-                elif details['comment'] == 'Need Manual Verification':
-                    details['comment'] = 'Need Manual Verification'
-                elif details['comment'] == 'Data not found':
-                    details['comment'] = 'No Data Found'
-
-                results.append(details)
-
-            results_df = pd.DataFrame(results)
-            filename = 'movie_ratings.xlsx'
-            results_df.to_excel(filename, index=False)
-
-            return jsonify({'download_url': f'/download/{filename}'})
+            # Record the job before it starts so it can be resumed even if it never ran
+            checkpoints.save_job(job_id, input_path, options)
+            job = job_manager.submit(input_path, job_id=job_id, **options)
+            return jsonify({
+                'job_id': job.id,
+                'status_url': f'/jobs/{job.id}',
+                'download_url': f'/jobs/{job.id}/result',
+            }), 202
         else:
             return jsonify({'error': 'Invalid file format. Please upload an Excel file with .xlsx extension.'})
     except Exception as e:
         logging.error(f"Error processing upload: {e}")
         return jsonify({'error': 'An error occurred while processing the file. Please try again.'})
-    
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job:
+        return jsonify(job.to_dict())
+    # Not running in this process: report what the checkpoint store knows
+    saved = checkpoints.load_job(job_id)
+    if not saved:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': 'done' if saved['status'] == 'done' else 'interrupted',
+        'rows_done': saved['rows_done'],
+        'created_at': saved['created_at'],
+        'resume_url': f'/jobs/{job_id}/resume',
+    })
+
+@app.route('/jobs/<job_id>/resume', methods=['POST'])
+def resume_job(job_id):
+    saved = checkpoints.load_job(job_id)
+    if not saved:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    if saved['status'] == 'done':
+        return jsonify({'error': 'Job already finished.', 'download_url': f'/jobs/{job_id}/result'}), 409
+    try:
+        job = job_manager.submit(saved['input_path'], job_id=job_id, **saved['options'])
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({
+        'job_id': job.id,
+        'status_url': f'/jobs/{job.id}',
+        'download_url': f'/jobs/{job.id}/result',
+    }), 202
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Unknown job id.'}), 404
+    # EventSource resends the last id it saw when it reconnects
+    last_event_id = request.headers.get('Last-Event-ID', default=0, type=int)
+
+    def stream():
+        cursor = last_event_id
+        last_throughput = 0
+        while True:
+            events = job.wait_for_events(cursor, timeout=config.JOB_THROUGHPUT_INTERVAL)
+            for event_id, name, data in events:
+                cursor = event_id
+                yield f"id: {event_id}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+            if time.monotonic() - last_throughput >= config.JOB_THROUGHPUT_INTERVAL:
+                last_throughput = time.monotonic()
+                yield f"event: throughput\ndata: {json.dumps(job.throughput())}\n\n"
+            if job.finished and not events:
+                break
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    extension = 'csv' if request.args.get('format') == 'csv' else 'xlsx'
+    job = job_manager.get(job_id)
+    if job:
+        if job.status == 'failed':
+            return jsonify({'error': f'Job failed: {job.error}'}), 500
+        if job.status != 'done':
+            return jsonify({'error': 'Job is not finished yet.', 'status_url': f'/jobs/{job.id}'}), 409
+    else:
+        saved = checkpoints.load_job(job_id)
+        if not saved or saved['status'] != 'done':
+            return jsonify({'error': 'Unknown job id.'}), 404
+
+    path = job_result_path(job_id, extension)
+    if not os.path.exists(path):
+        return jsonify({'error': f'No {extension.upper()} output for this job.'}), 404
+    return send_file(path, as_attachment=True, download_name=f'movie_ratings.{extension}')
+
+@app.route('/stats/waits')
+def wait_stats():
+    return jsonify(get_wait_stats())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats/sources')
+def source_stats():
+    return jsonify({source: breaker.stats() for source, breaker in breakers.items()})
+
+@app.route('/stats/lookups')
+def lookup_stats():
+    return jsonify(single_flight.stats())
+
+@app.route('/stats/browsers')
+def browser_stats():
+    return jsonify(browser_pool.stats())
+
+@app.route('/stats/rate-limits')
+def rate_limit_stats():
+    return jsonify(limiter.stats())
 
 @app.route('/download/<filename>')
 def download_file(filename):
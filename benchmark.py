@@ -0,0 +1,239 @@
+"""Offline throughput benchmark for the upload pipeline.
+
+Serves the saved pages in fixtures/ with fixture_server.py and points both
+scrapers at it. Synthetic workbooks are then pushed through the /upload route
+and the job is followed to completion. Each workbook size runs in a fresh
+subprocess with empty caches, so timings and peak RSS belong to that run
+alone.
+
+    python benchmark.py                              # 10, 100 and 1000 rows
+    python benchmark.py --rows 100 --output before.json
+    python benchmark.py --rows 100 --compare before.json
+
+Reported per run: rows/sec, p50/p95 per-row latency, peak RSS of this
+process, and peak RSS of the pooled browsers (chromedriver plus its Chrome
+processes), sampled every BROWSER_SAMPLE_INTERVAL seconds while the job runs.
+
+    python benchmark.py --rows 100 --browser-profile default --output default.json
+    python benchmark.py --rows 100 --browser-profile lightweight --compare default.json
+
+The second pair compares the browser launch profiles; browser page-load times
+are also in the fetch/search stages of /metrics.
+
+FVLB searches drive Chrome through the browser pool. On a machine without
+Chrome only the Classification Office path is exercised; FVLB lookups fail
+and its circuit breaker opens.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from browser_watchdog import tree_rss
+from fixture_server import serve_fixtures
+
+# No-results markers in fixtures/classification/_no_results.html and
+# fixtures/fvlb/search/_no_results.html
+FIXTURE_NO_RESULTS_MARKER = 'No ratings match your search.'
+FIXTURE_FVLB_NO_RESULTS_SELECTOR = '.no-results'
+# Seconds between samples of the pooled browsers' memory
+BROWSER_SAMPLE_INTERVAL = 0.5
+
+# Rows with a saved page on both fixture sites; every other row is a miss
+KNOWN_TITLES = [
+    ('The Matrix', 'Lana Wachowski', 1999),
+    ('The Matrix Reloaded', 'Lana Wachowski', 2003),
+]
+
+
+def synthetic_rows(count, hit_ratio=0.2):
+    """`count` (title, director, year) rows; about `hit_ratio` of them have saved pages."""
+    every = max(1, round(1 / hit_ratio)) if hit_ratio else 0
+    rows = []
+    for i in range(count):
+        if every and i % every == 0:
+            rows.append(KNOWN_TITLES[(i // every) % len(KNOWN_TITLES)])
+        else:
+            rows.append((f'Benchmark Film {i}', 'Jane Director', 1990 + i % 30))
+    return rows
+
+
+def write_workbook(path, rows):
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Movie_name', 'Director_name', 'Release_year'])
+    for row in rows:
+        sheet.append(list(row))
+    workbook.save(path)
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def peak_rss_mb(who):
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(who).ru_maxrss / 1024, 1)
+
+
+class BrowserMemorySampler:
+    """Tracks the peak combined RSS of the pool's live browsers on a background thread.
+
+    getrusage(RUSAGE_CHILDREN) only covers children that have exited, and the
+    pooled browsers are still running when the job finishes.
+    """
+
+    def __init__(self, pool, interval=BROWSER_SAMPLE_INTERVAL):
+        self.pool = pool
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        pids = [browser['pid'] for browser in self.pool.stats()['browsers'] if browser['pid']]
+        self.peak = max(self.peak, sum(tree_rss(pid) for pid in pids))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    @property
+    def peak_mb(self):
+        return round(self.peak / (1024 * 1024), 1)
+
+
+def run_one(row_count, hit_ratio, max_workers, lookup_mode):
+    """Upload one synthetic workbook through the Flask app and follow its job; runs in the child process."""
+    import alpha
+
+    path = os.path.join(os.environ['JOBS_DIR'], f'benchmark_{row_count}.xlsx')
+    os.makedirs(os.environ['JOBS_DIR'], exist_ok=True)
+    write_workbook(path, synthetic_rows(row_count, hit_ratio))
+
+    client = alpha.app.test_client()
+    with BrowserMemorySampler(alpha.browser_pool) as browser_memory:
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            form = {'file': (f, 'benchmark.xlsx'), 'lookup_mode': lookup_mode}
+            if max_workers:
+                form['max_workers'] = str(max_workers)
+            response = client.post('/upload', data=form, content_type='multipart/form-data')
+        job = alpha.job_manager.get(response.get_json()['job_id'])
+        while not job.finished:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+
+    rows = [data for _, kind, data in job.wait_for_events(0, 0) if kind == 'row']
+    # Rows answered by in-sheet deduplication report zero latency; only real lookups count
+    latencies = [row['latency'] for row in rows if row['latency'] > 0]
+    return {
+        'rows': row_count,
+        'status': job.status,
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(row_count / elapsed, 2) if elapsed else 0.0,
+        'lookups': len(latencies),
+        'p50_latency': round(percentile(latencies, 0.5), 3),
+        'p95_latency': round(percentile(latencies, 0.95), 3),
+        'peak_rss_mb': peak_rss_mb(resource.RUSAGE_SELF),
+        'browser_peak_rss_mb': browser_memory.peak_mb,
+        'comments': dict(Counter(row['comment'] for row in rows)),
+        'sources': dict(Counter(row['source'] for row in rows)),
+    }
+
+
+def run_benchmark(row_counts, hit_ratio=0.2, latency=0.05, max_workers=None, lookup_mode='sequential', env=None):
+    server = serve_fixtures(latency=latency)
+    base_url = f'http://{server.server_address[0]}:{server.server_address[1]}'
+    results = []
+    try:
+        for row_count in row_counts:
+            with tempfile.TemporaryDirectory(prefix='nz-benchmark-') as workdir:
+                child_env = dict(os.environ)
+                child_env.update({
+                    'CLASSIFICATION_SEARCH_URL': f'{base_url}/find-a-rating/',
+                    # The fixture's own no-results text, so misses are answered over HTTP
+                    'CLASSIFICATION_NO_RESULTS_MARKER': FIXTURE_NO_RESULTS_MARKER,
+                    'FVLB_BASE_URL': f'{base_url}/fvlb/',
+                    'FVLB_NO_RESULTS_SELECTOR': FIXTURE_FVLB_NO_RESULTS_SELECTOR,
+                    'JOBS_DIR': os.path.join(workdir, 'jobs'),
+                    'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoints.sqlite3'),
+                    'LOOKUP_CACHE_PATH': os.path.join(workdir, 'lookup_cache.sqlite3'),
+                    'MIRROR_PATH': os.path.join(workdir, 'mirror.sqlite3'),
+                })
+                child_env.update(env or {})
+                command = [sys.executable, os.path.abspath(__file__), '--run-one', str(row_count),
+                           '--hit-ratio', str(hit_ratio), '--lookup-mode', lookup_mode]
+                if max_workers:
+                    command += ['--max-workers', str(max_workers)]
+                completed = subprocess.run(command, env=child_env, cwd=workdir, capture_output=True, text=True)
+                if completed.returncode != 0:
+                    raise RuntimeError(f"Benchmark run with {row_count} rows failed:\n{completed.stderr[-2000:]}")
+                results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    finally:
+        server.shutdown()
+    return results
+
+
+def print_report(results, baseline=None):
+    baseline = {result['rows']: result for result in baseline or []}
+    print(f"{'rows':>6} {'rows/s':>9} {'p50 s':>8} {'p95 s':>8} {'RSS MB':>8} {'Chrome MB':>9}  outcomes")
+    for result in results:
+        print(f"{result['rows']:>6} {result['rows_per_sec']:>9} {result['p50_latency']:>8} {result['p95_latency']:>8} "
+              f"{result['peak_rss_mb']:>8} {result['browser_peak_rss_mb']:>9}  {result['comments']}")
+        before = baseline.get(result['rows'])
+        if before:
+            print(f"{'':>6} {result['rows_per_sec'] - before['rows_per_sec']:>+9.2f} "
+                  f"{result['p50_latency'] - before['p50_latency']:>+8.3f} {result['p95_latency'] - before['p95_latency']:>+8.3f} "
+                  f"{result['peak_rss_mb'] - before['peak_rss_mb']:>+8.1f} "
+                  f"{result['browser_peak_rss_mb'] - before.get('browser_peak_rss_mb', 0.0):>+9.1f}  vs baseline")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the upload pipeline against local copies of both sites.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10, 100, 1000], help='workbook sizes to run')
+    parser.add_argument('--hit-ratio', type=float, default=0.2, help='fraction of rows with saved pages')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the fixture server adds per response')
+    parser.add_argument('--max-workers', type=int, help='max_workers upload option')
+    parser.add_argument('--lookup-mode', default='sequential', choices=['sequential', 'hedged'])
+    parser.add_argument('--browser-profile', choices=['lightweight', 'default'],
+                        help='BROWSER_PROFILE for the runs (compare the two for page-load time and browser RSS)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='print differences against a previous --output file')
+    parser.add_argument('--run-one', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        print(json.dumps(run_one(args.run_one, args.hit_ratio, args.max_workers, args.lookup_mode)))
+        sys.exit(0)
+
+    env = {'BROWSER_PROFILE': args.browser_profile} if args.browser_profile else None
+    results = run_benchmark(args.rows, args.hit_ratio, args.latency, args.max_workers, args.lookup_mode, env)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,310 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from helium import start_chrome
+from selenium.webdriver import ChromeOptions
+
+import config
+from browser_watchdog import collect_zombies, descendants, driver_pid, kill_pids, reap_orphans, tree_rss
+from metrics import BROWSER_PROCESSES_REAPED, BROWSERS_RECYCLED, STAGE_SECONDS
+
+
+def lightweight_chrome_options():
+    """Chrome options for scraping text: no images, extensions or GPU, a small cache, eager page loads."""
+    options = ChromeOptions()
+    # Return from get() once the DOM is ready; the scrapers wait for the
+    # elements they need anyway
+    options.page_load_strategy = 'eager'
+    for argument in ['--disable-extensions', '--disable-gpu', '--mute-audio', '--no-first-run',
+                     '--disable-background-networking', '--blink-settings=imagesEnabled=false',
+                     f'--disk-cache-size={config.BROWSER_CACHE_BYTES}',
+                     f'--media-cache-size={config.BROWSER_CACHE_BYTES}']:
+        options.add_argument(argument)
+    options.add_experimental_option('prefs', {
+        'profile.managed_default_content_settings.images': 2,
+        'profile.managed_default_content_settings.media_stream': 2,
+        'profile.managed_default_content_settings.plugins': 2,
+    })
+    return options
+
+
+def block_urls(driver, patterns=None):
+    """Block fonts, media and third-party trackers for the driver's whole life via the DevTools protocol."""
+    patterns = config.BROWSER_BLOCKED_URLS if patterns is None else patterns
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception as e:
+        logging.warning(f"Could not install URL blocking in browser: {e}")
+
+
+class BrowserPool:
+    """Fixed-size pool of long-lived headless Chrome drivers.
+
+    Drivers are launched lazily up to `size`, checked out for a single lookup,
+    reset (cookies and navigation) and handed back. A driver that fails its
+    health check on checkout or its reset on return is quit and replaced.
+
+    Long-lived Chrome grows, so a driver is also recycled after `max_lookups`
+    checkouts or once its process tree (chromedriver plus Chrome) passes
+    `max_rss_mb`. A watchdog thread checks idle drivers' memory and kills
+    orphaned chromedriver/Chrome processes left behind by crashed runs. A
+    driver whose quit() fails has its process tree killed instead of leaking.
+    Reaping never overlaps a launch, whose chromedriver is not registered yet
+    and, when this process is PID 1, would look orphaned. As PID 1 the
+    watchdog also waits on re-parented Chrome processes that have exited.
+    """
+
+    def __init__(self, size=None, checkout_timeout=None, max_lookups=None, max_rss_mb=None):
+        self.size = size if size is not None else config.BROWSER_POOL_SIZE
+        self.checkout_timeout = checkout_timeout if checkout_timeout is not None else config.BROWSER_CHECKOUT_TIMEOUT
+        self.max_lookups = max_lookups if max_lookups is not None else config.BROWSER_MAX_LOOKUPS
+        max_rss_mb = max_rss_mb if max_rss_mb is not None else config.BROWSER_MAX_RSS_MB
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.recycled = Counter()
+        self.reaped = 0
+        self._idle = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        # Per-driver bookkeeping keyed on id(driver): chromedriver pid, checkouts, launch time, last RSS
+        self._drivers = {}
+        self._watchdog = None
+        self._stop = threading.Event()
+        # Launches in progress and whether the watchdog is reaping; each waits out the other
+        self._launching = 0
+        self._reaping = False
+        self._reap_cond = threading.Condition()
+
+    @property
+    def in_use(self):
+        with self._cond:
+            return self._created - len(self._idle)
+
+    def _launch(self):
+        self._start_watchdog()
+        with self._reap_cond:
+            while self._reaping:
+                self._reap_cond.wait()
+            self._launching += 1
+        try:
+            with STAGE_SECONDS.time(source='browser', stage='launch'):
+                if config.BROWSER_PROFILE != 'lightweight':
+                    driver = start_chrome(headless=True)
+                else:
+                    driver = start_chrome(headless=True, options=lightweight_chrome_options())
+                    block_urls(driver)
+                driver.set_page_load_timeout(config.WAIT_TIMEOUTS['page_load'])
+            with self._cond:
+                self._drivers[id(driver)] = {'pid': driver_pid(driver), 'lookups': 0, 'launched_at': time.time(), 'rss': 0}
+        finally:
+            with self._reap_cond:
+                self._launching -= 1
+        return driver
+
+    def _is_healthy(self, driver):
+        try:
+            driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._cond:
+            self._created -= 1
+            info = self._drivers.pop(id(driver), None)
+            self._cond.notify()
+        pid = info['pid'] if info else None
+        # Chrome is re-parented once chromedriver dies, so note the tree first
+        pids = [pid] + descendants(pid) if pid else []
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.warning(f"Error quitting browser, killing its processes: {e}")
+            kill_pids(pids)
+
+    def _recycle_reason(self, driver):
+        with self._cond:
+            info = self._drivers.get(id(driver))
+            if info is None:
+                return None
+            info['lookups'] += 1
+            lookups, pid = info['lookups'], info['pid']
+        if self.max_lookups and lookups >= self.max_lookups:
+            return 'lookups'
+        if self.max_rss:
+            rss = tree_rss(pid)
+            with self._cond:
+                info['rss'] = rss
+            if rss > self.max_rss:
+                return 'memory'
+        return None
+
+    def _recycle(self, driver, reason):
+        with self._cond:
+            self.recycled[reason] += 1
+        BROWSERS_RECYCLED.inc(reason=reason)
+        logging.info(f"Recycling browser ({reason})")
+        self._discard(driver)
+
+    def acquire(self):
+        with STAGE_SECONDS.time(source='browser', stage='checkout'):
+            return self._acquire()
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+                    if self._idle:
+                        driver = self._idle.pop()
+                        break
+                    if self._created < self.size:
+                        self._created += 1
+                        driver = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No browser available after {self.checkout_timeout}s")
+                    self._cond.wait(remaining)
+
+            if driver is None:
+                try:
+                    return self._launch()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_healthy(driver):
+                return driver
+            logging.warning("Replacing unresponsive browser from pool")
+            self._discard(driver)
+
+    def release(self, driver):
+        if self._closed:
+            self._discard(driver)
+            return
+        reason = self._recycle_reason(driver)
+        if reason:
+            self._recycle(driver, reason)
+            return
+        try:
+            # delete_all_cookies() only covers the current page's domain; the
+            # other site's cookies would survive it
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            driver.get('about:blank')
+        except Exception as e:
+            logging.warning(f"Browser failed to reset, discarding it: {e}")
+            self._discard(driver)
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    @contextmanager
+    def browser(self):
+        driver = self.acquire()
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def _start_watchdog(self):
+        with self._cond:
+            if self._watchdog is not None or not config.BROWSER_WATCHDOG_INTERVAL:
+                return
+            self._watchdog = threading.Thread(target=self._watch, name='browser-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def _watch(self):
+        # Check straight away too: a crashed earlier run may have left orphans
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                logging.error(f"Browser watchdog check failed: {e}")
+            if self._stop.wait(config.BROWSER_WATCHDOG_INTERVAL):
+                return
+
+    def check(self):
+        """Recycle idle drivers over the memory cap and reap orphaned browser processes."""
+        with self._cond:
+            idle = [(driver, self._drivers.get(id(driver))) for driver in self._idle]
+        for driver, info in idle:
+            if info is None:
+                continue
+            rss = tree_rss(info['pid'])
+            with self._cond:
+                info['rss'] = rss
+                over = self.max_rss and rss > self.max_rss and driver in self._idle
+                if over:
+                    self._idle.remove(driver)
+            if over:
+                self._recycle(driver, 'memory')
+
+        if config.BROWSER_REAP_ORPHANS:
+            self._reap()
+        if os.getpid() == 1:
+            collected = collect_zombies()
+            if collected:
+                logging.info(f"Collected {collected} exited browser processes")
+
+    def _reap(self):
+        with self._reap_cond:
+            if self._launching:
+                return  # Next pass
+            self._reaping = True
+        try:
+            with self._cond:
+                protected = [info['pid'] for info in self._drivers.values() if info['pid']]
+            reaped = reap_orphans(protected)
+        finally:
+            with self._reap_cond:
+                self._reaping = False
+                self._reap_cond.notify_all()
+        if reaped:
+            BROWSER_PROCESSES_REAPED.inc(reaped)
+            with self._cond:
+                self.reaped += reaped
+
+    def stats(self):
+        now = time.time()
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': self._created - len(self._idle),
+                'idle': len(self._idle),
+                'recycled': dict(self.recycled),
+                'reaped_processes': self.reaped,
+                'browsers': [
+                    {
+                        'pid': info['pid'],
+                        'lookups': info['lookups'],
+                        'age_seconds': round(now - info['launched_at'], 1),
+                        'rss_mb': round(info['rss'] / (1024 * 1024), 1),
+                    }
+                    for info in self._drivers.values()
+                ],
+            }
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        self._stop.set()
+        for driver in idle:
+            self._discard(driver)
+
+
+pool = BrowserPool()
+atexit.register(pool.close)
@@ -0,0 +1,197 @@
+"""Process inspection for the browser pool: per-browser RSS and orphan reaping.
+
+psutil is used when installed; otherwise the same information is read from
+/proc (Linux only). Where neither works the helpers report nothing and reap
+nothing, so the pool still runs, just without memory-based recycling.
+"""
+import logging
+import os
+import signal
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Process names that belong to a Selenium-driven Chrome
+CHROMEDRIVER_NAMES = {'chromedriver'}
+CHROME_NAMES = {'chrome', 'chromium', 'chromium-browser', 'google-chrome', 'headless_shell', 'chrome_crashpad'}
+
+
+def driver_pid(driver):
+    """PID of the chromedriver process behind a Selenium driver, if it can be found."""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+def _proc_table():
+    """pid -> (name, ppid, uid, state) for every process, read from /proc."""
+    table = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+            uid = os.stat(f'/proc/{entry}').st_uid
+        except OSError:
+            continue
+        # The name is parenthesized and may itself contain spaces or parens
+        name = stat[stat.index('(') + 1:stat.rindex(')')]
+        state, ppid = stat[stat.rindex(')') + 2:].split()[:2]
+        table[int(entry)] = (name, int(ppid), uid, state)
+    return table
+
+
+def _proc_cmdline(pid):
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            return f.read().replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        return ''
+
+
+def _proc_rss(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def descendants(pid):
+    """PIDs of every process below `pid`."""
+    if psutil is not None:
+        try:
+            return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+    try:
+        table = _proc_table()
+    except OSError:
+        return []
+    children = {}
+    for child, (_, ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(child)
+    found, stack = [], list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        found.append(child)
+        stack.extend(children.get(child, []))
+    return found
+
+
+def tree_rss(pid):
+    """Resident memory in bytes of `pid` and all its descendants (chromedriver plus its Chrome processes)."""
+    if pid is None:
+        return 0
+    if psutil is not None:
+        total = 0
+        try:
+            process = psutil.Process(pid)
+            processes = [process] + process.children(recursive=True)
+        except psutil.Error:
+            return 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+    return sum(_proc_rss(process) for process in [pid] + descendants(pid))
+
+
+def kill_pids(pids):
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def kill_tree(pid):
+    """Kill `pid` and everything below it; returns how many processes were signalled."""
+    pids = [pid] + descendants(pid)
+    kill_pids(pids)
+    return len(pids)
+
+
+def _is_selenium_chrome(name, cmdline):
+    if name in CHROMEDRIVER_NAMES:
+        return True
+    # Only headless, remotely driven Chrome; never a desktop browser
+    return name in CHROME_NAMES and ('--headless' in cmdline or '--remote-debugging-port' in cmdline)
+
+
+def find_orphans(protected=()):
+    """Our user's chromedriver / headless Chrome processes whose parent has died (re-parented to init).
+
+    When this process is itself PID 1 (a container without --init) the
+    drivers it spawns have parent 1 too; the caller must pass their PIDs in
+    `protected` and must not call this while a driver is still launching.
+    """
+    protected = set(protected)
+    uid = os.getuid()
+    orphans = []
+    if psutil is not None:
+        for process in psutil.process_iter(['pid', 'ppid', 'name', 'uids', 'status']):
+            info = process.info
+            if info['ppid'] != 1 or info['pid'] in protected or not info['uids'] or info['uids'].real != uid:
+                continue
+            # Already dead; only its parent can clear it
+            if info['status'] == psutil.STATUS_ZOMBIE:
+                continue
+            try:
+                cmdline = ' '.join(process.cmdline())
+            except psutil.Error:
+                continue
+            if _is_selenium_chrome(info['name'], cmdline):
+                orphans.append(info['pid'])
+        return orphans
+    try:
+        table = _proc_table()
+    except OSError:
+        return []
+    for pid, (name, ppid, owner, state) in table.items():
+        if ppid == 1 and state != 'Z' and owner == uid and pid not in protected and _is_selenium_chrome(name, _proc_cmdline(pid)):
+            orphans.append(pid)
+    return orphans
+
+
+def reap_orphans(protected=()):
+    """Kill orphaned browser process trees; returns the number of processes killed."""
+    killed = 0
+    for pid in find_orphans(protected):
+        logging.warning(f"Reaping orphaned browser process {pid}")
+        killed += kill_tree(pid)
+    return killed
+
+
+def collect_zombies():
+    """Wait on this process's defunct children; returns how many were collected.
+
+    Only needed when running as PID 1, where Chrome processes orphaned by a
+    dead chromedriver are re-parented to us and linger as zombies otherwise.
+    """
+    own = os.getpid()
+    if psutil is not None:
+        try:
+            pids = [child.pid for child in psutil.Process(own).children() if child.status() == psutil.STATUS_ZOMBIE]
+        except psutil.Error:
+            return 0
+    else:
+        try:
+            table = _proc_table()
+        except OSError:
+            return 0
+        pids = [pid for pid, (_, ppid, _, state) in table.items() if ppid == own and state == 'Z']
+    collected = 0
+    for pid in pids:
+        try:
+            if os.waitpid(pid, os.WNOHANG)[0]:
+                collected += 1
+        except ChildProcessError:
+            pass
+    return collected
@@ -0,0 +1,103 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import config
+
+
+class CheckpointStore:
+    """Durable record of upload jobs and of every row result as it completes.
+
+    A job whose process died can be resumed from here: its input file path and
+    options are kept, and only rows without a stored result are looked up again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or config.CHECKPOINT_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' input_path TEXT NOT NULL,'
+            ' options TEXT NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' created_at REAL NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS job_rows ('
+            ' job_id TEXT NOT NULL,'
+            ' row_index INTEGER NOT NULL,'
+            ' result TEXT NOT NULL,'
+            ' source TEXT,'
+            ' PRIMARY KEY (job_id, row_index))'
+        )
+        self._conn.commit()
+
+    def save_job(self, job_id, input_path, options, status='running'):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO jobs (id, input_path, options, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_id, input_path, json.dumps(options), status, time.time()),
+            )
+            self._conn.commit()
+
+    def set_status(self, job_id, status):
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET status = ? WHERE id = ?', (status, job_id))
+            self._conn.commit()
+
+    def load_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT input_path, options, status, created_at FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            rows_done = self._conn.execute('SELECT COUNT(*) FROM job_rows WHERE job_id = ?', (job_id,)).fetchone()[0]
+        return {
+            'job_id': job_id,
+            'input_path': row[0],
+            'options': json.loads(row[1]),
+            'status': row[2],
+            'created_at': row[3],
+            'rows_done': rows_done,
+        }
+
+    def save_rows(self, job_id, rows):
+        """Store `(row_index, details, source)` results for a job in one transaction."""
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO job_rows (job_id, row_index, result, source) VALUES (?, ?, ?, ?)',
+                [(job_id, index, json.dumps(details), source) for index, details, source in rows],
+            )
+            self._conn.commit()
+
+    def load_rows(self, job_id, start=0, end=None):
+        """Return `{row_index: (details, source)}` for completed rows with start <= index < end."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT row_index, result, source FROM job_rows WHERE job_id = ? AND row_index >= ? AND row_index < ?',
+                (job_id, start, end if end is not None else 2 ** 62),
+            ).fetchall()
+        return {index: (json.loads(result), source) for index, result, source in rows}
+
+    def source_counts(self, job_id):
+        """Return `{source: completed rows}` for a job."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, COUNT(*) FROM job_rows WHERE job_id = ? GROUP BY source', (job_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def unfinished_jobs(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status != 'done' ORDER BY created_at").fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,94 @@
+"""Per-source circuit breakers for the lookup chain.
+
+After `failure_threshold` consecutive failed attempts against a source its
+breaker opens, and lookups skip the source straight away instead of waiting
+out timeouts and retries. Once `reset_timeout` seconds have passed, a single
+probe lookup is let through; its success closes the breaker and its failure
+re-opens it for another `reset_timeout`.
+"""
+import logging
+import threading
+import time
+
+import config
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class SourceUnavailable(Exception):
+    """The source's circuit breaker is open."""
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout if reset_timeout is not None else config.BREAKER_RESET_TIMEOUT
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a live lookup may go to the source now."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            # One probe at a time; a probe that never reports back (cancelled,
+            # say) is replaced after another reset_timeout
+            if (self.state == OPEN and now - self._opened_at >= self.reset_timeout) or \
+                    (self.state == HALF_OPEN and now - self._probe_started >= self.reset_timeout):
+                self.state = HALF_OPEN
+                self._probe_started = now
+                logging.info(f"Probing {self.name} after its circuit breaker opened")
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logging.info(f"{self.name} is answering again; closing its circuit breaker")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    self.times_opened += 1
+                    logging.warning(f"{self.name} failed {self.consecutive_failures} times in a row; "
+                                    f"skipping it for {self.reset_timeout:.0f}s")
+                self.state = OPEN
+                self._opened_at = time.monotonic()
+
+    def guard(self, lookup):
+        """Wrap `lookup` so it raises SourceUnavailable instead of running while the breaker is open."""
+        def guarded(*args, **kwargs):
+            if not self.allow():
+                raise SourceUnavailable(self.name)
+            return lookup(*args, **kwargs)
+        return guarded
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited,
+            }
+
+
+breakers = {
+    'classificationoffice': CircuitBreaker('classificationoffice'),
+    'fvlb': CircuitBreaker('fvlb'),
+}
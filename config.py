@@ -0,0 +1,154 @@
+import os
+
+# Browser pool: number of long-lived headless Chrome drivers shared by all lookups
+BROWSER_POOL_SIZE = int(os.environ.get('BROWSER_POOL_SIZE', '2'))
+# Seconds a lookup waits for a free browser before giving up
+BROWSER_CHECKOUT_TIMEOUT = float(os.environ.get('BROWSER_CHECKOUT_TIMEOUT', '120'))
+# Recycle a pooled browser after this many lookups, or once chromedriver plus
+# its Chrome processes use more than BROWSER_MAX_RSS_MB (0 disables either)
+BROWSER_MAX_LOOKUPS = int(os.environ.get('BROWSER_MAX_LOOKUPS', '200'))
+BROWSER_MAX_RSS_MB = float(os.environ.get('BROWSER_MAX_RSS_MB', '1024'))
+# Seconds between watchdog passes over idle browsers and orphaned
+# chromedriver/Chrome processes (0 disables the watchdog)
+BROWSER_WATCHDOG_INTERVAL = float(os.environ.get('BROWSER_WATCHDOG_INTERVAL', '30'))
+# Running as PID 1 (a container without --init) is supported: the pool's own
+# drivers are never reaped and exited Chrome processes re-parented to the app
+# are waited on, though --init is still the cleaner setup
+BROWSER_REAP_ORPHANS = os.environ.get('BROWSER_REAP_ORPHANS', '1').lower() in ('1', 'true', 'yes')
+# 'lightweight' launches Chrome without images, media, fonts, extensions or GPU,
+# with eager page loads and a capped cache; 'default' is plain headless Chrome
+BROWSER_PROFILE = os.environ.get('BROWSER_PROFILE', 'lightweight')
+BROWSER_CACHE_BYTES = int(os.environ.get('BROWSER_CACHE_BYTES', str(8 * 1024 * 1024)))
+# URL patterns the lightweight profile never loads: images, media, fonts and
+# common third-party trackers. BROWSER_BLOCK_CSS=1 also drops stylesheets,
+# which the scrapers do not need but which changes what element.text sees on
+# pages that hide content with CSS.
+BROWSER_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.mp4', '*.webm', '*.mp3', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*facebook.net*',
+    '*hotjar.com*', '*youtube.com*', '*vimeo.com*',
+] + [pattern for pattern in os.environ.get('BROWSER_EXTRA_BLOCKED_URLS', '').split(',') if pattern]
+if os.environ.get('BROWSER_BLOCK_CSS', '0').lower() in ('1', 'true', 'yes'):
+    BROWSER_BLOCKED_URLS.append('*.css')
+
+# Classification Office search endpoint; point at fixture_server.py to work offline
+CLASSIFICATION_SEARCH_URL = os.environ.get('CLASSIFICATION_SEARCH_URL', 'https://www.classificationoffice.govt.nz/find-a-rating/')
+# 'http' fetches the search page with a pooled HTTP client and only falls back to
+# Chrome when the listing markup is missing; 'browser' always uses Chrome
+FETCH_MODE = os.environ.get('FETCH_MODE', 'http')
+# Text that only appears on a Classification Office search with no matches.
+# Copy it from a saved page of the live site; when set, such a page fetched
+# over HTTP is taken as a miss instead of being re-rendered in Chrome. Empty
+# (the default) sends every page without listings to the browser.
+CLASSIFICATION_NO_RESULTS_MARKER = os.environ.get('CLASSIFICATION_NO_RESULTS_MARKER', '')
+HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', '15'))
+HTTP_POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', '10'))
+
+# Upper bound on rows looked up concurrently per upload; keep it at or below
+# BROWSER_POOL_SIZE plus whatever the HTTP path can absorb
+MAX_WORKERS = int(os.environ.get('MAX_WORKERS', '4'))
+
+# Readiness waits: per-step timeouts in seconds (see waits.get_wait_stats() / the
+# /stats/waits route for how long each step actually takes)
+WAIT_POLL_INTERVAL = float(os.environ.get('WAIT_POLL_INTERVAL', '0.1'))
+WAIT_TIMEOUT_DEFAULT = float(os.environ.get('WAIT_TIMEOUT_DEFAULT', '10'))
+WAIT_TIMEOUTS = {
+    # Listing divs appearing on a browser-rendered Classification Office search
+    'classification_listings': float(os.environ.get('WAIT_CLASSIFICATION_LISTINGS', '5')),
+    # First FVLB result title, or the no-results message, appearing after a search
+    'fvlb_results': float(os.environ.get('WAIT_FVLB_RESULTS', '10')),
+    # FVLB result list no longer growing
+    'fvlb_results_settled': float(os.environ.get('WAIT_FVLB_RESULTS_SETTLED', '3')),
+    # FVLB detail page rendered after clicking a result
+    'fvlb_detail': float(os.environ.get('WAIT_FVLB_DETAIL', '5')),
+    # Any browser.get(): Selenium's own page-load timeout (its default is 300s,
+    # long enough to hold a pooled browser hostage)
+    'page_load': float(os.environ.get('WAIT_PAGE_LOAD', '30')),
+}
+# Attempts per lookup; only attempts that raise are retried (a search that
+# loads but matches nothing is a miss). Failed attempts back off exponentially
+# with jitter, starting from RETRY_DELAY seconds and capped at RETRY_BACKOFF_MAX
+LOOKUP_RETRIES = int(os.environ.get('LOOKUP_RETRIES', '2'))
+RETRY_DELAY = float(os.environ.get('RETRY_DELAY', '1'))
+RETRY_BACKOFF_MAX = float(os.environ.get('RETRY_BACKOFF_MAX', '30'))
+# A source is skipped ("Source Unavailable") after this many consecutive failed
+# attempts, and probed again after BREAKER_RESET_TIMEOUT seconds
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('BREAKER_RESET_TIMEOUT', '60'))
+# Extra attempts for an HTTP fetch that times out, fails to connect, or gets
+# a 429/5xx response
+HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', '2'))
+
+# Per-host request rate (requests/second) and burst, shared by all workers in
+# the process; a rate of 0 disables the limit for that host
+RATE_LIMITS = {
+    'classificationoffice.govt.nz': (float(os.environ.get('RATE_LIMIT_CLASSIFICATIONOFFICE', '4')),
+                                     int(os.environ.get('RATE_BURST_CLASSIFICATIONOFFICE', '4'))),
+    'fvlb.org.nz': (float(os.environ.get('RATE_LIMIT_FVLB', '4')),
+                    int(os.environ.get('RATE_BURST_FVLB', '4'))),
+}
+
+# Persistent per-source lookup cache
+LOOKUP_CACHE_PATH = os.environ.get('LOOKUP_CACHE_PATH', 'lookup_cache.sqlite3')
+# Seconds a cached result stays valid; 0 keeps entries until evicted
+LOOKUP_CACHE_TTL = float(os.environ.get('LOOKUP_CACHE_TTL', str(7 * 24 * 3600)))
+LOOKUP_CACHE_MAX_ENTRIES = int(os.environ.get('LOOKUP_CACHE_MAX_ENTRIES', '100000'))
+
+# Also keep parsed Classification Office search results in the lookup cache
+# database so they outlive the job that fetched them
+SEARCH_CACHE_PERSIST = os.environ.get('SEARCH_CACHE_PERSIST', '0').lower() in ('1', 'true', 'yes')
+
+# Background upload jobs: how many run at once, and where uploads/results are kept
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+JOBS_DIR = os.environ.get('JOBS_DIR', 'jobs')
+# Completed-row events kept per job for progress streams, and how often the
+# stream emits an aggregate throughput event
+JOB_EVENT_BUFFER = int(os.environ.get('JOB_EVENT_BUFFER', '10000'))
+JOB_THROUGHPUT_INTERVAL = float(os.environ.get('JOB_THROUGHPUT_INTERVAL', '5'))
+# Seconds a finished job (and its event log) stays in memory; after that its
+# status and result are served from the checkpoint store
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', '3600'))
+# Per-row job results, so an interrupted job can be resumed
+CHECKPOINT_PATH = os.environ.get('CHECKPOINT_PATH', os.path.join(JOBS_DIR, 'checkpoints.sqlite3'))
+
+# Rows per DataFrame when streaming an uploaded workbook
+INPUT_BATCH_SIZE = int(os.environ.get('INPUT_BATCH_SIZE', '500'))
+# Finished lookups remembered for in-sheet deduplication
+DEDUP_RECENT_RESULTS = int(os.environ.get('DEDUP_RECENT_RESULTS', '10000'))
+# Finished rows the result writer may hold while an earlier row is still being
+# looked up; past this the sheet is not read further until lookups catch up
+RESULT_BUFFER_ROWS = int(os.environ.get('RESULT_BUFFER_ROWS', '1000'))
+
+# Local mirror of scraped classification records (see mirror.py)
+MIRROR_PATH = os.environ.get('MIRROR_PATH', 'mirror.sqlite3')
+# Answer lookups from the mirror before going to the live sites
+MIRROR_LOOKUP = os.environ.get('MIRROR_LOOKUP', '1').lower() in ('1', 'true', 'yes')
+# Seconds before a mirrored record is considered stale and re-scraped
+MIRROR_MAX_AGE = float(os.environ.get('MIRROR_MAX_AGE', str(30 * 24 * 3600)))
+
+# 'sequential' asks FVLB only after a Classification Office miss; 'hedged'
+# queries both sources at once and keeps the first direct hit
+LOOKUP_MODE = os.environ.get('LOOKUP_MODE', 'sequential')
+# Threads shared by all hedged lookups (two per row in flight)
+HEDGE_WORKERS = int(os.environ.get('HEDGE_WORKERS', str(4 * MAX_WORKERS)))
+
+# FVLB home page with the search form
+FVLB_BASE_URL = os.environ.get('FVLB_BASE_URL', 'https://www.fvlb.org.nz/')
+# Optional results-page URL with a {query} placeholder. When set, the browser
+# opens it directly instead of filling in the search form. There is no
+# default because the site's results URL is not a documented interface; copy
+# one from the address bar after a search.
+FVLB_SEARCH_URL_TEMPLATE = os.environ.get('FVLB_SEARCH_URL_TEMPLATE', '')
+# CSS selector for the element an FVLB search shows when nothing matches; copy
+# it from a saved page of the live site. When set, a search showing neither it
+# nor a result within WAIT_FVLB_RESULTS counts as a failed attempt. Empty (the
+# default) treats that as a miss that is neither cached nor counted for or
+# against the source's circuit breaker.
+FVLB_NO_RESULTS_SELECTOR = os.environ.get('FVLB_NO_RESULTS_SELECTOR', '')
+# Threads fetching FVLB detail pages over HTTP, shared by all lookups
+FVLB_DETAIL_WORKERS = int(os.environ.get('FVLB_DETAIL_WORKERS', '8'))
+
+# HTML parser for scraped pages: 'selectolax', 'lxml' or 'bs4'; empty picks
+# the fastest one installed (see parsing.py)
+HTML_PARSER = os.environ.get('HTML_PARSER', '')
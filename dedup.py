@@ -0,0 +1,59 @@
+import threading
+from collections import OrderedDict
+
+import config
+
+
+class StreamingDeduper:
+    """Collapses rows with the same lookup key while the sheet is still being read.
+
+    The first row for a key is scheduled for lookup; later rows either join the
+    in-flight lookup or, if it already finished recently, reuse its result
+    straight away. Only in-flight keys and the last `recent_size` results are
+    kept, so memory does not grow with the sheet. A duplicate of an older key
+    is scheduled again and is answered by the lookup cache.
+    """
+
+    def __init__(self, recent_size=None):
+        self.recent_size = recent_size if recent_size is not None else config.DEDUP_RECENT_RESULTS
+        self.rows = 0
+        self.unique_lookups = 0
+        # Rows that joined an in-flight lookup and will all be answered when it finishes
+        self.joined_waiting = 0
+        self._in_flight = {}
+        self._recent = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key, row_index):
+        """Register a row; returns 'lookup', 'joined' or a finished `(details, source)` pair."""
+        with self._lock:
+            self.rows += 1
+            if key in self._in_flight:
+                self._in_flight[key].append(row_index)
+                self.joined_waiting += 1
+                return 'joined'
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                return self._recent[key]
+            self._in_flight[key] = [row_index]
+            self.unique_lookups += 1
+            return 'lookup'
+
+    def complete(self, key, details, source):
+        """Record a finished lookup and return the row indices waiting on it."""
+        with self._lock:
+            row_indices = self._in_flight.pop(key)
+            self.joined_waiting -= len(row_indices) - 1
+            if self.recent_size:
+                self._recent[key] = (details, source)
+                if len(self._recent) > self.recent_size:
+                    self._recent.popitem(last=False)
+            return row_indices
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rows': self.rows,
+                'unique_lookups': self.unique_lookups,
+                'dedup_ratio': round(1 - self.unique_lookups / self.rows, 3) if self.rows else 0.0,
+            }
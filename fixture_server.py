@@ -0,0 +1,96 @@
+"""Local stand-in for the Classification Office and FVLB sites.
+
+Serves saved pages from fixtures/ so both scrapers can be exercised offline:
+
+    python fixture_server.py --port 8765
+    CLASSIFICATION_SEARCH_URL=http://127.0.0.1:8765/find-a-rating/ \
+    FVLB_BASE_URL=http://127.0.0.1:8765/fvlb/ python alpha.py
+
+A Classification Office search for "The Matrix" is answered with
+fixtures/classification/the-matrix.html. The FVLB home page
+(fixtures/fvlb/home.html) has the same search form as the real site and submits
+to /fvlb/search?q=, which serves fixtures/fvlb/search/<slug>.html. Result links
+point at /fvlb/title/<slug>, which serves fixtures/fvlb/detail/<slug>.html.
+Anything without a saved page gets the section's _no_results.html.
+
+`--latency` delays every response to stand in for the network.
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def fixture_slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-')
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Seconds added to every response
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(self.path)
+        path = url.path.rstrip('/')
+        if path == '/find-a-rating':
+            search = parse_qs(url.query).get('search', [''])[0]
+            self.send_fixture('classification', fixture_slug(search))
+        elif path == '/fvlb':
+            self.send_fixture('fvlb', 'home')
+        elif path == '/fvlb/search':
+            search = parse_qs(url.query).get('q', [''])[0]
+            self.send_fixture(os.path.join('fvlb', 'search'), fixture_slug(search))
+        elif path.startswith('/fvlb/title/'):
+            self.send_fixture(os.path.join('fvlb', 'detail'), fixture_slug(path[len('/fvlb/title/'):]))
+        else:
+            self.send_error(404)
+
+    def send_fixture(self, section, slug):
+        path = os.path.join(FIXTURES_DIR, section, f'{slug}.html')
+        if not os.path.exists(path):
+            path = os.path.join(FIXTURES_DIR, section, '_no_results.html')
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug(f"fixture_server: {format % args}")
+
+
+def serve_fixtures(host='127.0.0.1', port=0, latency=0.0):
+    """Start the fixture server on a background thread and return it.
+
+    The bound address is available as `server.server_address`; call
+    `server.shutdown()` when done.
+    """
+    handler = type('FixtureHandler', (FixtureHandler,), {'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    FixtureHandler.latency = args.latency
+    server = ThreadingHTTPServer((args.host, args.port), FixtureHandler)
+    logging.info(f"Serving fixtures on http://{args.host}:{args.port}/find-a-rating/ "
+                 f"and http://{args.host}:{args.port}/fvlb/")
+    server.serve_forever()
@@ -0,0 +1,54 @@
+import logging
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from rate_limit import backoff_delay, limiter
+
+USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+# Responses worth retrying; 429 and 503 also slow the host's rate limiter down
+TRANSIENT_STATUSES = {429, 500, 502, 503, 504}
+
+# One keep-alive session for the whole process; urllib3's connection pool is
+# thread-safe, so concurrent lookups reuse connections per host.
+session = requests.Session()
+session.headers.update({'User-Agent': USER_AGENT})
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE)
+session.mount('http://', _adapter)
+session.mount('https://', _adapter)
+
+
+def retry_after(response):
+    try:
+        return min(float(response.headers.get('Retry-After', '')), config.RETRY_BACKOFF_MAX)
+    except ValueError:
+        return None
+
+
+def fetch(url, timeout=None, retries=None):
+    retries = config.HTTP_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        limiter.acquire(url)
+        try:
+            response = session.get(url, timeout=timeout or config.HTTP_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == retries:
+                raise
+            delay = backoff_delay(attempt)
+            logging.info(f"Retrying {url} in {delay:.1f}s after {e}")
+            time.sleep(delay)
+            continue
+
+        if response.status_code in TRANSIENT_STATUSES and attempt < retries:
+            if response.status_code in (429, 503):
+                limiter.throttled(url)
+            delay = retry_after(response) or backoff_delay(attempt)
+            logging.info(f"Retrying {url} in {delay:.1f}s after HTTP {response.status_code}")
+            time.sleep(delay)
+            continue
+
+        response.raise_for_status()
+        limiter.succeeded(url)
+        return response.text
@@ -0,0 +1,58 @@
+import pandas as pd
+from openpyxl import load_workbook
+
+import config
+
+INPUT_COLUMNS = ['Movie_name', 'Director_name', 'Release_year']
+
+
+def count_input_rows(path):
+    """Data rows in the first sheet according to its stored dimensions, or None if it doesn't say."""
+    workbook = load_workbook(path, read_only=True)
+    try:
+        max_row = workbook.worksheets[0].max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
+
+
+def iter_input_batches(path, batch_size=None):
+    """Yield the lookup columns of the first sheet in DataFrames of up to `batch_size` rows.
+
+    The workbook is read in openpyxl's read-only mode, so only the current
+    batch is held in memory. Each DataFrame is indexed by the row's position
+    in the sheet (0 = first data row), matching what `pd.read_excel` would
+    give. Trailing blank rows are dropped, as `pd.read_excel` does.
+    """
+    batch_size = batch_size or config.INPUT_BATCH_SIZE
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        positions = {name: i for i, name in enumerate(header)}
+        missing = [column for column in INPUT_COLUMNS if column not in positions]
+        if missing:
+            raise KeyError(f"Missing column(s) in upload: {', '.join(missing)}")
+        wanted = [positions[column] for column in INPUT_COLUMNS]
+
+        batch = []
+        blank_rows = 0
+        start = 0
+        for row in rows:
+            if all(value is None for value in row):
+                blank_rows += 1
+                continue
+            # Blank rows only count if more data follows them
+            batch.extend([[None] * len(INPUT_COLUMNS)] * blank_rows)
+            blank_rows = 0
+            batch.append([row[i] if i < len(row) else None for i in wanted])
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=INPUT_COLUMNS, index=range(start, start + len(batch)))
+                start += len(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=INPUT_COLUMNS, index=range(start, start + len(batch)))
+    finally:
+        workbook.close()
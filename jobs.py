@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+
+
+class Job:
+    """Progress and outcome of one background upload.
+
+    Besides the counters, a job keeps a bounded log of numbered events (one
+    per completed row plus a final status event) that progress streams can
+    follow with `wait_for_events`.
+    """
+
+    def __init__(self, input_path, options=None, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.input_path = input_path
+        self.options = options or {}
+        self.status = 'queued'
+        self.rows_total = 0
+        self.rows_done = 0
+        self.rows_restored = 0
+        self.source_hits = Counter()
+        self.dedup = {}
+        self.result_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._events = deque(maxlen=config.JOB_EVENT_BUFFER)
+        self._last_event_id = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+
+    def _add_event(self, name, data):
+        self._last_event_id += 1
+        self._events.append((self._last_event_id, name, data))
+        self._cond.notify_all()
+
+    def start(self, rows_total, restored_hits=None):
+        """Mark the job running; `restored_hits` counts rows per source restored from a checkpoint."""
+        restored_hits = Counter({source or 'none': rows for source, rows in (restored_hits or {}).items()})
+        with self._lock:
+            self.status = 'running'
+            self.rows_total = rows_total or 0
+            self.rows_done = sum(restored_hits.values())
+            self.rows_restored = self.rows_done
+            self.source_hits = restored_hits
+            self.started_at = time.time()
+
+    def update_progress(self, rows_total=None, dedup=None):
+        with self._lock:
+            if rows_total is not None:
+                self.rows_total = rows_total
+            if dedup is not None:
+                self.dedup = dedup
+
+    def record_row(self, row_indices, comment, source, latency):
+        """Record one completed lookup, shared by every input row in `row_indices`."""
+        with self._lock:
+            self.rows_done += len(row_indices)
+            self.source_hits[source or 'none'] += len(row_indices)
+            for index in row_indices:
+                self._add_event('row', {
+                    'index': index,
+                    'comment': comment,
+                    'source': source or 'none',
+                    'latency': round(latency, 3),
+                })
+
+    def finish(self, result_path):
+        with self._lock:
+            self.status = 'done'
+            self.result_path = result_path
+            self.finished_at = time.time()
+            self._add_event('status', {'status': self.status})
+
+    def fail(self, error):
+        with self._lock:
+            self.status = 'failed'
+            self.error = str(error)
+            self.finished_at = time.time()
+            self._add_event('status', {'status': self.status, 'error': self.error})
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def wait_for_events(self, after_id, timeout):
+        """Return events numbered above `after_id`, waiting up to `timeout` seconds for one."""
+        with self._cond:
+            if self._last_event_id <= after_id and not self.finished:
+                self._cond.wait(timeout)
+            return [event for event in self._events if event[0] > after_id]
+
+    def throughput(self):
+        with self._lock:
+            elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0
+            rows_processed = self.rows_done - self.rows_restored
+            return {
+                'rows_done': self.rows_done,
+                'rows_total': self.rows_total,
+                'rows_per_min': round(rows_processed / elapsed * 60, 1) if elapsed else 0.0,
+            }
+
+    def eta_seconds(self):
+        rows_processed = self.rows_done - self.rows_restored
+        if self.status != 'running' or rows_processed <= 0 or not self.rows_total:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / rows_processed * max(self.rows_total - self.rows_done, 0), 1)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'rows_done': self.rows_done,
+                'rows_total': self.rows_total,
+                'rows_restored': self.rows_restored,
+                'source_hits': dict(self.source_hits),
+                'dedup': self.dedup,
+                'eta_seconds': self.eta_seconds(),
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'error': self.error,
+            }
+
+
+class JobManager:
+    """Runs jobs on a dedicated worker pool, separate from the request threads.
+
+    `runner(job)` does the work and returns the result file path; progress is
+    reported through the job's own methods. Finished jobs, with their event
+    logs, are dropped `retention` seconds after they finish; the routes then
+    fall back to the checkpoint store.
+    """
+
+    def __init__(self, runner, max_workers=None, retention=None):
+        self.runner = runner
+        self.retention = retention if retention is not None else config.JOB_RETENTION
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or config.JOB_WORKERS, thread_name_prefix='job')
+
+    def submit(self, input_path, job_id=None, **options):
+        job = Job(input_path, options, job_id=job_id)
+        with self._lock:
+            existing = self._jobs.get(job.id)
+            if existing and not existing.finished:
+                raise RuntimeError(f"Job {job.id} is already {existing.status}")
+            self._prune()
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def status_counts(self):
+        with self._lock:
+            self._prune()
+            return Counter(job.status for job in self._jobs.values())
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _run(self, job):
+        try:
+            job.finish(self.runner(job))
+        except Exception as e:
+            logging.error(f"Job {job.id} failed: {e}")
+            job.fail(e)
@@ -0,0 +1,192 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter
+from concurrent.futures import Future
+
+import config
+from metrics import CACHE_REQUESTS, COALESCED_LOOKUPS
+
+
+class Uncacheable(Exception):
+    """A lookup answer to report but not cache, e.g. from a results page that never finished rendering."""
+
+    def __init__(self, result):
+        super().__init__('lookup result is not cacheable')
+        self.result = result
+
+
+def normalize_text(value):
+    value = unicodedata.normalize('NFKC', str(value))
+    return re.sub(r'\s+', ' ', value).strip().casefold()
+
+
+def normalize_year(value):
+    value = normalize_text(value)
+    # Excel hands integer years over as floats ("2019.0")
+    return value[:-2] if value.endswith('.0') else value
+
+
+def lookup_key(movie_name, director_name, release_year):
+    return '|'.join((normalize_text(movie_name), normalize_text(director_name), normalize_year(release_year)))
+
+
+class LookupCache:
+    """SQLite-backed cache of per-source lookup results.
+
+    Rows are keyed on (source, normalized movie|director|year) and hold the
+    result dict as JSON (``null`` for a miss) with the time it was fetched.
+    Entries older than `ttl` seconds are ignored; once the table grows past
+    `max_entries` the oldest fetches are evicted.
+    """
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = path or config.LOOKUP_CACHE_PATH
+        self.ttl = ttl if ttl is not None else config.LOOKUP_CACHE_TTL
+        self.max_entries = max_entries if max_entries is not None else config.LOOKUP_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS lookups ('
+            ' source TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' result TEXT,'
+            ' fetched_at REAL NOT NULL,'
+            ' PRIMARY KEY (source, key))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS lookups_fetched_at ON lookups (fetched_at)')
+        self._conn.commit()
+
+    def get(self, source, key):
+        """Return ``(hit, result)``; a cached miss is ``(True, None)``."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result, fetched_at FROM lookups WHERE source = ? AND key = ?', (source, key)
+            ).fetchone()
+        if row is None or (self.ttl and time.time() - row[1] > self.ttl):
+            return False, None
+        return True, json.loads(row[0])
+
+    def put(self, source, key, result):
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO lookups (source, key, result, fetched_at) VALUES (?, ?, ?, ?)',
+                (source, key, json.dumps(result), time.time()),
+            )
+            self._conn.commit()
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 100:
+                self._puts_since_evict = 0
+                self._evict()
+
+    def _evict(self):
+        count = self._conn.execute('SELECT COUNT(*) FROM lookups').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                'DELETE FROM lookups WHERE rowid IN (SELECT rowid FROM lookups ORDER BY fetched_at LIMIT ?)', (excess,)
+            )
+            self._conn.commit()
+            logging.info(f"Evicted {excess} entries from lookup cache")
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM lookups')
+            self._conn.commit()
+
+
+cache = LookupCache()
+
+
+class SingleFlight:
+    """Coalesces identical in-flight lookups across every job in the process.
+
+    The first caller for a (source, key) runs the lookup; callers arriving
+    while it runs wait for its result instead of starting another browser or
+    HTTP fetch. If the first caller fails (or is cancelled), each waiter runs
+    the lookup itself rather than inheriting that failure. Every caller gets
+    its own copy of the result, since callers rewrite fields in place.
+    """
+
+    def __init__(self):
+        self.coalesced = Counter()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, source, key, lookup):
+        waited = False
+        while True:
+            with self._lock:
+                future = self._in_flight.get((source, key))
+                leader = future is None
+                if leader:
+                    future = self._in_flight[(source, key)] = Future()
+                elif not waited:
+                    self.coalesced[source] += 1
+            if leader:
+                break
+            if not waited:
+                COALESCED_LOOKUPS.inc(source=source)
+                waited = True
+            try:
+                result = future.result()
+            except Exception:
+                continue
+            return json.loads(json.dumps(result))
+
+        try:
+            result = lookup()
+        except BaseException as e:
+            self._finish(source, key)
+            future.set_exception(e)
+            raise
+        self._finish(source, key)
+        future.set_result(result)
+        return json.loads(json.dumps(result))
+
+    def _finish(self, source, key):
+        # Drop the entry before publishing, so a waiter retrying after a
+        # failure never finds the failed future again
+        with self._lock:
+            del self._in_flight[(source, key)]
+
+    def stats(self):
+        with self._lock:
+            return {'coalesced': dict(self.coalesced), 'in_flight': len(self._in_flight)}
+
+
+single_flight = SingleFlight()
+
+
+def cached_lookup(source, lookup, movie_name, director_name, release_year, refresh=False, key=None):
+    """Call `lookup` through the cache; `refresh` skips the read but still stores the fresh result.
+
+    `key` can be passed when the caller has already computed the lookup key.
+    Concurrent misses for the same key share one call to `lookup`. Only what
+    `lookup` returns is stored; a lookup that raises (every attempt at the
+    site failed) is not cached as a miss, and one that raises Uncacheable has
+    its result returned without being stored.
+    """
+    key = key or lookup_key(movie_name, director_name, release_year)
+    if not refresh:
+        hit, result = cache.get(source, key)
+        CACHE_REQUESTS.inc(cache=f'lookup_{source}', result='hit' if hit else 'miss')
+        if hit:
+            return result
+
+    def fetch():
+        try:
+            result = lookup(movie_name, director_name, release_year)
+        except Uncacheable as e:
+            return e.result
+        cache.put(source, key, result)
+        return result
+
+    return single_flight.run(source, key, fetch)
@@ -0,0 +1,224 @@
+"""Fuzzy matching of titles and director names.
+
+Scores are normalized edit-distance similarities in [0, 1] computed on
+case-folded, NFKC-normalized, whitespace-collapsed text. `similarity` also
+tries the tokens in sorted order, so "Wachowski Lana" matches "Lana
+Wachowski". rapidfuzz is used when installed; otherwise a bit-parallel
+Levenshtein (Hyyrö's algorithm) keeps scoring linear in string length.
+
+Callers only act on scores above a threshold, so `score_many` takes one and
+skips the edit distance for candidates that cannot reach it: the length
+difference and the character-count difference are both lower bounds on the
+edit distance, and are far cheaper to compute than it.
+
+The thresholds below replace the old difflib.SequenceMatcher cut-offs.
+They were chosen with `calibrate()` on CALIBRATION_PAIRS so that they accept
+and reject the same pairs the old cut-offs did. Run `python matching.py` to
+re-check them.
+"""
+import re
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+
+try:
+    from rapidfuzz.distance import Levenshtein as _rf_levenshtein
+except ImportError:
+    _rf_levenshtein = None
+
+# SequenceMatcher 0.8235 -> Classification Office partial (title and director) match
+CLASSIFICATION_PARTIAL_THRESHOLD = 0.83
+# SequenceMatcher 0.9 -> FVLB title / director counted as the same film
+FVLB_EXACT_THRESHOLD = 0.86
+# SequenceMatcher 0.8 -> FVLB title good enough to offer for manual verification
+FVLB_PARTIAL_THRESHOLD = 0.77
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKC', str(text))
+    return re.sub(r'\s+', ' ', text).strip().casefold()
+
+
+def _pattern_table(pattern):
+    table = {}
+    for i, char in enumerate(pattern):
+        table[char] = table.get(char, 0) | (1 << i)
+    return table
+
+
+def _levenshtein(pattern, table, text):
+    """Edit distance between `pattern` (with its precomputed bit table) and `text`."""
+    m = len(pattern)
+    if not m:
+        return len(text)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    get = table.get
+    pv, mv, score = mask, 0, m
+    for char in text:
+        eq = get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (mask ^ (xh | pv))
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        pv = ((mh << 1) & mask) | (mask ^ (xv | ph))
+        mv = ph & xv
+    return score
+
+
+class _Query:
+    """A normalized query with its bit tables built once for scoring many candidates."""
+
+    def __init__(self, text):
+        self.text = normalize(text)
+        self.sorted_tokens = ' '.join(sorted(self.text.split()))
+        self.char_counts = Counter(self.text)
+        if _rf_levenshtein is None:
+            self.table = _pattern_table(self.text)
+            self.sorted_table = _pattern_table(self.sorted_tokens)
+
+    def _ratio(self, query, table, candidate):
+        longest = max(len(query), len(candidate))
+        if not longest:
+            return 1.0
+        if _rf_levenshtein is not None:
+            return _rf_levenshtein.normalized_similarity(query, candidate)
+        if query == candidate:
+            return 1.0
+        return 1 - _levenshtein(query, table, candidate) / longest
+
+    def score(self, candidate):
+        return self.score_normalized(normalize(candidate))
+
+    def score_normalized(self, candidate):
+        score = self._ratio(self.text, getattr(self, 'table', None), candidate)
+        sorted_candidate = ' '.join(sorted(candidate.split()))
+        if sorted_candidate != candidate or self.sorted_tokens != self.text:
+            score = max(score, self._ratio(self.sorted_tokens, getattr(self, 'sorted_table', None), sorted_candidate))
+        return score
+
+    def bound(self, candidate, threshold=1.0):
+        """Upper bound on score_normalized(candidate); sorting tokens keeps both length and characters.
+
+        The cheap length bound is returned as soon as it falls below `threshold`.
+        """
+        longest = max(len(self.text), len(candidate))
+        if not longest:
+            return 1.0
+        length_bound = 1 - abs(len(self.text) - len(candidate)) / longest
+        if length_bound < threshold:
+            return length_bound
+        # Every edit fixes at most one surplus character on each side
+        surplus = Counter(candidate)
+        surplus.subtract(self.char_counts)
+        extra = sum(count for count in surplus.values() if count > 0)
+        missing = -sum(count for count in surplus.values() if count < 0)
+        return 1 - max(extra, missing) / longest
+
+
+def similarity(a, b):
+    return _Query(a).score(b)
+
+
+def score_many(query, candidates, threshold=0.0):
+    """Score one query against every candidate; returns a list of scores in candidate order.
+
+    Candidates that provably score below `threshold` are not scored and get 0.0.
+    """
+    prepared = _Query(query)
+    scores = []
+    for candidate in candidates:
+        candidate = normalize(candidate)
+        if threshold and prepared.bound(candidate, threshold) < threshold:
+            scores.append(0.0)
+        else:
+            scores.append(prepared.score_normalized(candidate))
+    return scores
+
+
+# Pairs seen in uploads and on the two sites: (uploaded value, scraped value)
+CALIBRATION_PAIRS = [
+    ('The Matrix', 'The Matrix'),
+    ('The Matrix', 'Matrix, The'),
+    ('The Matrix', 'The Matrix Reloaded'),
+    ('The Matrix', 'Matrix'),
+    ('Spider-Man: No Way Home', 'Spider-Man No Way Home'),
+    ('Spiderman No Way Home', 'Spider-Man: No Way Home'),
+    ('Harry Potter and the Philosopher\'s Stone', 'Harry Potter and the Philosophers Stone'),
+    ('Harry Potter and the Chamber of Secrets', 'Harry Potter and the Philosopher\'s Stone'),
+    ('Fast & Furious 6', 'Fast and Furious 6'),
+    ('Fast & Furious 6', 'Fast & Furious 7'),
+    ('Mission: Impossible - Fallout', 'Mission Impossible Fallout'),
+    ('Mission: Impossible', 'Mission: Impossible II'),
+    ('Amelie', 'Amélie'),
+    ('Pokemon Detective Pikachu', 'Pokémon Detective Pikachu'),
+    ('Star Wars: The Last Jedi', 'Star Wars: Episode VIII - The Last Jedi'),
+    ('The Lord of the Rings: The Two Towers', 'The Lord of the Rings: The Return of the King'),
+    ('Frozen', 'Frozen II'),
+    ('Frozen II', 'Frozen 2'),
+    ('It', 'Us'),
+    ('Up', 'Up'),
+    ('Toy Story 3', 'Toy Story 4'),
+    ('Alien', 'Aliens'),
+    ('Se7en', 'Seven'),
+    ('The Godfather Part II', 'The Godfather: Part II'),
+    ('Bad Boys for Life', 'Bad Boys For Life'),
+    ('Oppenheimer', 'Oppenheimer'),
+    ('Barbie', 'Barbie'),
+    ('Once Upon a Time in Hollywood', 'Once Upon a Time... in Hollywood'),
+    ('Lana Wachowski', 'Lana Wachowski'),
+    ('Lana Wachowski', 'Lilly Wachowski'),
+    ('Christopher Nolan', 'Christopher Nolan'),
+    ('Christopher Nolan', 'Chris Nolan'),
+    ('Christopher Nolan', 'Nolan Christopher'),
+    ('Denis Villeneuve', 'Denis Villenueve'),
+    ('Greta Gerwig', 'Greta Gerwig'),
+    ('Jon Watts', 'John Watts'),
+    ('Jon Watts', 'James Wan'),
+    ('Steven Spielberg', 'Steven Soderbergh'),
+    ('Joel Coen', 'Ethan Coen'),
+    ('Ridley Scott', 'Tony Scott'),
+    ('Peter Jackson', 'Peter Jackson'),
+    ('Taika Waititi', 'Taika Waititi'),
+    ('Jane Campion', 'Jane Campion'),
+    ('Bong Joon Ho', 'Bong Joon-ho'),
+    ('Alejandro Gonzalez Inarritu', 'Alejandro G. Iñárritu'),
+    ('Quentin Tarantino', 'Quentin Tarrantino'),
+]
+
+
+def _old_similarity(a, b):
+    return SequenceMatcher(None, a.lower(), b.lower()).ratio()
+
+
+def calibrate(old_threshold, pairs=None):
+    """Pick the new threshold that best reproduces `old_threshold`'s decisions on `pairs`.
+
+    Returns `(threshold, agreement)` where agreement is the fraction of pairs
+    on which both scorers accept or reject alike. Ties go to the highest
+    threshold, to stay conservative.
+    """
+    pairs = pairs or CALIBRATION_PAIRS
+    decisions = [(_old_similarity(a, b) >= old_threshold, similarity(a, b)) for a, b in pairs]
+    best = (0.0, -1.0)
+    for step in range(50, 100):
+        threshold = step / 100
+        agreement = sum((score >= threshold) == accepted for accepted, score in decisions) / len(decisions)
+        if agreement >= best[1]:
+            best = (threshold, agreement)
+    return best
+
+
+if __name__ == "__main__":
+    for name, old, new in [
+        ('CLASSIFICATION_PARTIAL_THRESHOLD', 0.8235, CLASSIFICATION_PARTIAL_THRESHOLD),
+        ('FVLB_EXACT_THRESHOLD', 0.9, FVLB_EXACT_THRESHOLD),
+        ('FVLB_PARTIAL_THRESHOLD', 0.8, FVLB_PARTIAL_THRESHOLD),
+    ]:
+        threshold, agreement = calibrate(old)
+        print(f"{name}: SequenceMatcher {old} -> calibrated {threshold} (agreement {agreement:.0%}), configured {new}")
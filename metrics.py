@@ -0,0 +1,149 @@
+"""In-process metrics rendered in the Prometheus text format for the /metrics route.
+
+Recording is a dict update under a lock, so the hot path costs a couple of
+microseconds whether or not anything scrapes the endpoint. Gauges for state that
+lives elsewhere (pool size, breaker state, ...) are read by callbacks only when
+the endpoint is scraped.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self._sample_lines())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _sample_lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(_Metric):
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Read the value at scrape time: `function()` returns a number, or a dict of label tuple -> number."""
+        self._function = function
+
+    def _sample_lines(self):
+        if self._function is not None:
+            values = self._function()
+            values = values.items() if isinstance(values, dict) else [((), values)]
+        else:
+            with self._lock:
+                values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}' for key, value in sorted(values)]
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _sample_lines(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, key, [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {total!r}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+def render():
+    return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+# Shared metrics; gauges backed by other modules' state are wired up in alpha.py
+STAGE_SECONDS = Histogram('nz_automate_stage_seconds', 'Time spent in each stage of a lookup or job',
+                          ['source', 'stage'])
+ROW_SECONDS = Histogram('nz_automate_row_seconds', 'End-to-end lookup time per unique row', ['source'])
+ROWS = Counter('nz_automate_rows_total', 'Rows completed, by outcome comment and answering source',
+               ['comment', 'source'])
+CACHE_REQUESTS = Counter('nz_automate_cache_requests_total', 'Cache reads by cache and result', ['cache', 'result'])
+COALESCED_LOOKUPS = Counter('nz_automate_coalesced_lookups_total',
+                            'Lookups that waited on an identical in-flight lookup instead of fetching', ['source'])
+BROWSERS_RECYCLED = Counter('nz_automate_browsers_recycled_total', 'Pooled browsers replaced, by reason', ['reason'])
+BROWSER_PROCESSES_REAPED = Counter('nz_automate_browser_processes_reaped_total',
+                                   'Orphaned chromedriver/Chrome processes killed by the watchdog')
@@ -0,0 +1,202 @@
+"""Local mirror of classification records scraped from both sources.
+
+Every record the scrapers parse is harvested into a SQLite table, and an
+in-memory inverted index of character trigrams over the normalized title and
+director (partitioned by release year) answers lookups without touching the
+live sites. Only fresh records that pass the same direct-match rules as the
+scrapers are returned; anything else is a miss and goes to the live sites.
+
+    python mirror.py sync     # import records already held in the lookup cache
+    python mirror.py stats
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+
+import config
+import matching
+from metrics import CACHE_REQUESTS
+from lookup_cache import cache as lookup_cache, normalize_text, normalize_year
+
+RECORD_FIELDS = ['title', 'director_text', 'year', 'classification', 'MR', 'run_time',
+                 'label_issued_by', 'label_issued_on', 'link']
+# Candidates scored in full after trigram counting
+MAX_CANDIDATES = 20
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Mirror:
+
+    def __init__(self, path=None, max_age=None):
+        self.path = path or config.MIRROR_PATH
+        self.max_age = max_age if max_age is not None else config.MIRROR_MAX_AGE
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            ' id INTEGER PRIMARY KEY,'
+            ' source TEXT NOT NULL,'
+            ' title_norm TEXT NOT NULL,'
+            ' director_norm TEXT NOT NULL,'
+            ' year TEXT NOT NULL,'
+            ' record TEXT NOT NULL,'
+            ' fetched_at REAL NOT NULL,'
+            ' UNIQUE (source, title_norm, director_norm, year))'
+        )
+        self._conn.commit()
+        # year -> trigram -> record ids; director trigrams are prefixed with '|'
+        self._index = defaultdict(lambda: defaultdict(set))
+        # record id -> (source, title_norm, director_norm, fetched_at)
+        self._meta = {}
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        rows = self._conn.execute(
+            'SELECT id, source, title_norm, director_norm, year, fetched_at FROM records'
+        ).fetchall()
+        for row in rows:
+            self._index_record(*row)
+        self._loaded = True
+
+    def _index_record(self, record_id, source, title_norm, director_norm, year, fetched_at):
+        postings = self._index[year]
+        for gram in trigrams(title_norm):
+            postings[gram].add(record_id)
+        for gram in trigrams(director_norm):
+            postings['|' + gram].add(record_id)
+        self._meta[record_id] = (source, title_norm, director_norm, fetched_at)
+
+    def harvest(self, source, records):
+        """Store scraped records (dicts with RECORD_FIELDS) and index them."""
+        now = time.time()
+        with self._lock:
+            self._ensure_loaded()
+            for record in records:
+                title_norm = normalize_text(record.get('title', ''))
+                director_norm = normalize_text(record.get('director_text', ''))
+                year = normalize_year(record.get('year', ''))
+                if not title_norm or not year.isdigit():
+                    continue
+                payload = json.dumps({field: record.get(field, 'N/A') for field in RECORD_FIELDS})
+                key = (source, title_norm, director_norm, year)
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO records (source, title_norm, director_norm, year, record, fetched_at)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)', key + (payload, now),
+                )
+                self._conn.execute(
+                    'UPDATE records SET record = ?, fetched_at = ?'
+                    ' WHERE source = ? AND title_norm = ? AND director_norm = ? AND year = ?', (payload, now) + key,
+                )
+                record_id = self._conn.execute(
+                    'SELECT id FROM records WHERE source = ? AND title_norm = ? AND director_norm = ? AND year = ?', key,
+                ).fetchone()[0]
+                self._index_record(record_id, source, title_norm, director_norm, year, now)
+            self._conn.commit()
+
+    def lookup(self, movie_name, director_name, release_year):
+        """Return `(details, source)` for a fresh direct match, or None."""
+        year = normalize_year(release_year)
+        title_norm = normalize_text(movie_name)
+        director_norm = normalize_text(director_name)
+        with self._lock:
+            self._ensure_loaded()
+            postings = self._index.get(year)
+            if not postings or not title_norm:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache='mirror', result='miss')
+                return None
+            counts = Counter()
+            for gram in trigrams(title_norm):
+                counts.update(postings.get(gram, ()))
+            for gram in trigrams(director_norm):
+                counts.update(postings.get('|' + gram, ()))
+            candidates = [(record_id, self._meta[record_id]) for record_id, _ in counts.most_common(MAX_CANDIDATES)]
+
+        now = time.time()
+        best = None
+        for record_id, (source, candidate_title, candidate_director, fetched_at) in candidates:
+            if self.max_age and now - fetched_at > self.max_age:
+                continue
+            title_score = matching.similarity(title_norm, candidate_title)
+            if title_score < matching.FVLB_EXACT_THRESHOLD:
+                continue
+            # Same director rules as the scrapers' direct matches
+            if director_norm not in candidate_director and \
+                    matching.similarity(director_norm, candidate_director) < matching.FVLB_EXACT_THRESHOLD:
+                continue
+            if best is None or title_score > best[0]:
+                best = (title_score, record_id, source)
+
+        if best is None:
+            self.misses += 1
+            CACHE_REQUESTS.inc(cache='mirror', result='miss')
+            return None
+        self.hits += 1
+        CACHE_REQUESTS.inc(cache='mirror', result='hit')
+        with self._lock:
+            record = json.loads(self._conn.execute('SELECT record FROM records WHERE id = ?', (best[1],)).fetchone()[0])
+        return {
+            'movie_name': movie_name,
+            'director_name': director_name,
+            'release_year': year,
+            'classification': record['classification'],
+            'run_time': record['run_time'],
+            'label_issued_by': record['label_issued_by'],
+            'label_issued_on': record['label_issued_on'],
+            'MR': record['MR'],
+            'CD': record['classification'],
+            'link': record['link'],
+            'comment': 'Found as Direct Search'
+        }, best[2]
+
+    def stats(self):
+        with self._lock:
+            self._ensure_loaded()
+            by_source = dict(self._conn.execute('SELECT source, COUNT(*) FROM records GROUP BY source').fetchall())
+            return {'records': len(self._meta), 'by_source': by_source, 'years': len(self._index),
+                    'hits': self.hits, 'misses': self.misses}
+
+
+mirror = Mirror()
+
+
+def sync_from_lookup_cache():
+    """Harvest every record already held in the lookup cache database."""
+    rows = lookup_cache._conn.execute('SELECT source, result FROM lookups').fetchall()
+    harvested = Counter()
+    for source, result in rows:
+        result = json.loads(result)
+        if not result:
+            continue
+        if source == 'classificationoffice_search':
+            mirror.harvest('classificationoffice', [dict(listing, year=listing.get('release_year', ''))
+                                                    for listing in result])
+            harvested['classificationoffice'] += len(result)
+        elif result.get('comment') == 'Found as Direct Search':
+            mirror.harvest(source, [dict(result, title=result.get('movie_name', ''),
+                                         director_text=result.get('director_name', ''),
+                                         year=result.get('release_year', ''))])
+            harvested[source] += 1
+    return dict(harvested)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage the local classification mirror.')
+    parser.add_argument('command', choices=['sync', 'stats'])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'sync':
+        logging.info(f"Harvested {sync_from_lookup_cache()} records from {lookup_cache.path}")
+    print(json.dumps(mirror.stats(), indent=2))
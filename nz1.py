@@ -1,13 +1,14 @@
 import datetime
 import pandas as pd
 from bs4 import BeautifulSoup
-from helium import start_chrome, write, click, S, find_all, get_driver
 import time
 from flask import Flask, request, send_file, jsonify
 import logging
 import re
 from difflib import SequenceMatcher
 
+from browser_pool import pool as browser_pool
+
 app = Flask(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
@@ -25,9 +26,10 @@ def get_movie_details_from_website(movie_name, director_name, release_year, retr
 
     for attempt in range(retries):
         try:
-            browser = start_chrome(search_url, headless=True)
-            time.sleep(5)  # Wait for the page to load
-            page_source = browser.page_source
+            with browser_pool.browser() as browser:
+                browser.get(search_url)
+                time.sleep(5)  # Wait for the page to load
+                page_source = browser.page_source
             soup = BeautifulSoup(page_source, 'html.parser')
             listings = soup.find_all('div', {'data-listing': ''})
 
@@ -67,7 +69,6 @@ def get_movie_details_from_website(movie_name, director_name, release_year, retr
                             elif 'Label issued on:' in line:
                                 label_issued_on = lines[i + 1].strip()
 
-                    browser.quit()
                     return {
                         'movie_name': movie_name,
                         'director_name': director_name,
@@ -84,7 +85,6 @@ def get_movie_details_from_website(movie_name, director_name, release_year, retr
 
                 # Partial matching fallback
                 if string_similarity(movie_name, title) >= similarity_threshold and string_similarity(director_name, director_text) >= similarity_threshold:
-                    browser.quit()
                     return {
                         'movie_name': movie_name,
                         'director_name': director_name,
@@ -98,7 +98,6 @@ def get_movie_details_from_website(movie_name, director_name, release_year, retr
                         'link': search_url,
                         'Comment': 'Need Manual Verification'
                     }
-            browser.quit()
         except Exception as e:
             logging.error(f"Error fetching details for {movie_name} (attempt {attempt+1}/{retries}): {e}")
             time.sleep(5)  # Wait before retrying
@@ -0,0 +1,235 @@
+"""HTML parsing for both scrapers, on the fastest parser that is installed.
+
+selectolax is preferred, then lxml, then BeautifulSoup's html.parser. Each
+backend visits only the elements that can hold a field (the listing divs'
+h3/p/table children, or the h1 and film-* divs of an FVLB detail page) and
+fills every field in one pass over them. The bs4 backend uses a SoupStrainer
+so it builds nothing outside the listing divs.
+
+Field selection matches the original BeautifulSoup `find` calls: the first
+element whose class list contains the class, except the classification line,
+which must have exactly class="large mb-2".
+
+    python parsing.py    # microbenchmark every backend on the saved fixture pages
+"""
+import argparse
+import glob
+import os
+import re
+import timeit
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html as lxml_html
+except ImportError:
+    lxml_html = None
+
+import config
+
+BACKENDS = [name for name, available in [
+    ('selectolax', HTMLParser is not None),
+    ('lxml', lxml_html is not None),
+    ('bs4', True),
+] if available]
+
+
+def default_backend():
+    if config.HTML_PARSER:
+        if config.HTML_PARSER not in BACKENDS:
+            raise ValueError(f"HTML_PARSER={config.HTML_PARSER!r} is not installed (available: {BACKENDS})")
+        return config.HTML_PARSER
+    return BACKENDS[0]
+
+
+# Per-backend element access: iterate (tag, class attribute, node) over a
+# subtree, and read a node's text
+
+def _bs4_elements(node, names):
+    for element in node.find_all(names):
+        yield element.name, ' '.join(element.get('class', [])), element
+
+def _lxml_elements(node, names):
+    for element in node.iter(*names):
+        yield element.tag, element.get('class', ''), element
+
+def _selectolax_elements(node, names):
+    for element in node.css(', '.join(names)):
+        yield element.tag, element.attributes.get('class') or '', element
+
+def _bs4_strings(node):
+    return list(node.stripped_strings)
+
+def _lxml_strings(node):
+    return [text.strip() for text in node.itertext() if text.strip()]
+
+def _selectolax_strings(node):
+    return [line for line in node.text(deep=True, separator='\n', strip=True).split('\n') if line]
+
+def _bs4_raw_text(node):
+    return node.get_text()
+
+def _lxml_raw_text(node):
+    return ''.join(node.itertext())
+
+def _selectolax_raw_text(node):
+    return node.text(deep=True)
+
+
+def _bs4_listing_nodes(page_source):
+    soup = BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer('div', attrs={'data-listing': True}))
+    return soup.find_all('div', attrs={'data-listing': True})
+
+def _lxml_listing_nodes(page_source):
+    return lxml_html.fromstring(page_source).xpath('//div[@data-listing]')
+
+def _selectolax_listing_nodes(page_source):
+    return HTMLParser(page_source).css('div[data-listing]')
+
+def _bs4_document(page_source):
+    return BeautifulSoup(page_source, 'html.parser', parse_only=SoupStrainer(['h1', 'div']))
+
+def _lxml_document(page_source):
+    return lxml_html.fromstring(page_source)
+
+def _selectolax_document(page_source):
+    return HTMLParser(page_source)
+
+
+_BACKEND_FUNCTIONS = {
+    'bs4': (_bs4_listing_nodes, _bs4_document, _bs4_elements, _bs4_strings, _bs4_raw_text),
+    'lxml': (_lxml_listing_nodes, _lxml_document, _lxml_elements, _lxml_strings, _lxml_raw_text),
+    'selectolax': (_selectolax_listing_nodes, _selectolax_document, _selectolax_elements, _selectolax_strings,
+                   _selectolax_raw_text),
+}
+
+
+def _listing_slots(tag, class_attr):
+    classes = class_attr.split()
+    if tag == 'h3' and 'h2' in classes:
+        yield 'title'
+    elif tag == 'p':
+        if 'small' in classes:
+            yield 'director'
+        if class_attr == 'large mb-2':
+            yield 'classification'
+        if 'large' in classes:
+            yield 'MR'
+    elif tag == 'table' and 'rating-result-table' in classes:
+        yield 'table'
+
+def _fvlb_slots(tag, class_attr):
+    classes = class_attr.split()
+    if tag == 'h1':
+        yield 'title'
+    elif tag == 'div':
+        if 'film-director' in classes:
+            yield 'director'
+        if 'film-classification' in classes:
+            yield 'classification'
+        if 'film-approved' in classes:
+            yield 'approved'
+
+def _collect(elements, slots):
+    found = {}
+    for tag, class_attr, node in elements:
+        for slot in slots(tag, class_attr):
+            found.setdefault(slot, []).append(node)
+    return found
+
+
+def parse_classification_listings(page_source, backend=None):
+    """Listings on a Classification Office search page, as dicts of the reported fields."""
+    listing_nodes, _, elements, strings, _ = _BACKEND_FUNCTIONS[backend or default_backend()]
+    listings = []
+
+    for listing in listing_nodes(page_source):
+        found = _collect(elements(listing, ['h3', 'p', 'table']), _listing_slots)
+        if 'title' not in found or 'director' not in found:
+            continue
+
+        director_text = ''.join(strings(found['director'][0]))
+        # Extract release year and director name from the text
+        release_year_found = re.search(r'(\d{4})', director_text)
+
+        run_time = 'N/A'
+        label_issued_by = 'N/A'
+        label_issued_on = 'N/A'
+        if 'table' in found:
+            lines = '\n'.join(strings(found['table'][0])).split('\n')
+            for i, line in enumerate(lines[:-1]):
+                if 'Running time:' in line:
+                    run_time = lines[i + 1].strip()
+                elif 'Label issued by:' in line:
+                    label_issued_by = lines[i + 1].strip()
+                elif 'Label issued on:' in line:
+                    label_issued_on = lines[i + 1].strip()
+
+        listings.append({
+            'title': ''.join(strings(found['title'][0])),
+            'director_text': director_text,
+            'release_year': release_year_found.group(1) if release_year_found else 'N/A',
+            'classification': ''.join(strings(found['classification'][0])) if 'classification' in found else 'N/A',
+            'MR': ''.join(strings(found['MR'][0])) if 'MR' in found else 'N/A',
+            'run_time': run_time,
+            'label_issued_by': label_issued_by,
+            'label_issued_on': label_issued_on,
+        })
+    return listings
+
+
+def parse_fvlb_detail(page_source, backend=None):
+    """Pull the fields we report from an FVLB detail page; None if it has no film details."""
+    _, document, elements, _, raw_text = _BACKEND_FUNCTIONS[backend or default_backend()]
+    found = _collect(elements(document(page_source), ['h1', 'div']), _fvlb_slots)
+    if 'director' not in found:
+        return None
+
+    dir_text = raw_text(found['director'][0]).strip().replace('Directed by ', '')
+    runtime = 'N/A'
+    if len(found.get('approved', [])) > 1:
+        runtime = raw_text(found['approved'][1]).strip().replace('This title has a runtime of ', '').replace(' minutes.', '')
+
+    return {
+        'title': raw_text(found['title'][0]).strip() if 'title' in found else 'N/A',
+        'director_text': dir_text,
+        'release_year': dir_text.split(",")[0].strip() if ',' in dir_text else 'N/A',
+        'classification': raw_text(found['classification'][0]).strip() if 'classification' in found else 'N/A',
+        'run_time': runtime,
+    }
+
+
+def benchmark(number=200):
+    """Per-page parse time for every installed backend, against a full html.parser soup."""
+    fixtures_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+    pages = [(path, parse_classification_listings) for path in sorted(glob.glob(os.path.join(fixtures_dir, 'classification', '*.html')))]
+    pages += [(path, parse_fvlb_detail) for path in sorted(glob.glob(os.path.join(fixtures_dir, 'fvlb', 'detail', '*.html')))]
+    report = []
+    for path, parse in pages:
+        with open(path, encoding='utf-8') as f:
+            page_source = f.read()
+        # What the scrapers did before this module: build the whole tree
+        baseline = timeit.timeit(lambda: BeautifulSoup(page_source, 'html.parser'), number=number) / number
+        expected = parse(page_source, backend='bs4')
+        timings = {}
+        for backend in BACKENDS:
+            if parse(page_source, backend=backend) != expected:
+                raise AssertionError(f"{backend} disagrees with bs4 on {path}")
+            timings[backend] = timeit.timeit(lambda: parse(page_source, backend=backend), number=number) / number
+        report.append((os.path.relpath(path, fixtures_dir), baseline, timings))
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Microbenchmark the HTML parsing backends on saved pages.')
+    parser.add_argument('--number', type=int, default=200, help='parses per page and backend')
+    args = parser.parse_args()
+    for page, baseline, timings in benchmark(args.number):
+        print(f"{page}: full html.parser soup {baseline * 1000:.3f} ms")
+        for backend, elapsed in timings.items():
+            print(f"  {backend:<10} {elapsed * 1000:.3f} ms ({baseline / elapsed:.1f}x)")
@@ -0,0 +1,44 @@
+import pandas as pd
+
+# Same rule as is_valid_director_name, applied to a whole column at once
+VALID_DIRECTOR_PATTERN = r'[a-zA-Z ]+'
+
+
+def normalize_text_column(series):
+    """Column-wise equivalent of lookup_cache.normalize_text."""
+    return (series.fillna('').astype(str)
+            .str.normalize('NFKC')
+            .str.replace(r'\s+', ' ', regex=True)
+            .str.strip()
+            .str.casefold())
+
+
+def parse_year_column(series):
+    """Parse release years to nullable integers; "2019", 2019 and 2019.0 all give 2019."""
+    numbers = pd.to_numeric(series, errors='coerce')
+    is_year = numbers.notna() & (numbers == numbers.round()) & numbers.between(1800, 2200)
+    return numbers.where(is_year).astype('Int64')
+
+
+def prepare_input_batch(df):
+    """Clean a batch of uploaded rows and compute their lookup keys, column by column.
+
+    Adds:
+      year            - Release_year parsed to Int64 (<NA> if it isn't a year)
+      valid_director  - whether Director_name passes the director name rule
+      lookup_key      - normalized "title|director|year", as lookup_cache.lookup_key builds it
+    and rewrites Movie_name, Director_name and Release_year as clean strings,
+    with years in plain "2019" form so they compare equal to scraped years.
+    """
+    df['Movie_name'] = df['Movie_name'].fillna('').astype(str).str.strip()
+    df['Director_name'] = df['Director_name'].fillna('').astype(str).str.strip()
+
+    raw_year = df['Release_year'].fillna('').astype(str).str.strip()
+    df['year'] = parse_year_column(df['Release_year'])
+    df['Release_year'] = df['year'].astype(str).where(df['year'].notna(), raw_year)
+
+    df['valid_director'] = df['Director_name'].str.fullmatch(VALID_DIRECTOR_PATTERN).fillna(False).astype(bool)
+
+    year_key = normalize_text_column(df['Release_year']).str.replace(r'\.0$', '', regex=True)
+    df['lookup_key'] = normalize_text_column(df['Movie_name']) + '|' + normalize_text_column(df['Director_name']) + '|' + year_key
+    return df
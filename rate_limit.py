@@ -0,0 +1,121 @@
+"""Per-host request pacing and retry backoff, shared by every worker in the process.
+
+Each configured host (config.RATE_LIMITS, matched on the domain and its
+subdomains) gets a token bucket. Every HTTP request and browser navigation to
+that host takes a token first, so adding workers never raises the request
+rate past the limit. When a host answers 429 or 503 its rate is halved, and
+each success adds back a twentieth of the configured rate. The limiter
+therefore settles near the fastest rate the site tolerates instead of a
+fixed, conservative pace. Hosts without a limit, such as the local fixture
+server, are not paced.
+"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import config
+
+# Lowest rate a throttled host is slowed to, as a fraction of its configured rate
+MIN_RATE_FRACTION = 0.1
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponential backoff with full jitter for retry number `attempt` (0-based)."""
+    base = config.RETRY_DELAY if base is None else base
+    cap = config.RETRY_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.throttles = 0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    if waited:
+                        self.waits += 1
+                        self.waited_seconds += waited
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self):
+        with self._lock:
+            self.throttles += 1
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class RateLimiter:
+
+    def __init__(self, limits=None):
+        limits = config.RATE_LIMITS if limits is None else limits
+        self._buckets = {domain: TokenBucket(rate, burst) for domain, (rate, burst) in limits.items() if rate > 0}
+
+    def bucket_for(self, url):
+        host = urlparse(url).hostname or ''
+        for domain, bucket in self._buckets.items():
+            if host == domain or host.endswith('.' + domain):
+                return bucket
+        return None
+
+    def acquire(self, url):
+        bucket = self.bucket_for(url)
+        if bucket is None:
+            return 0.0
+        waited = bucket.acquire()
+        if waited > 1:
+            logging.debug(f"Rate limiter held a request to {url} for {waited:.2f}s")
+        return waited
+
+    def throttled(self, url):
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            bucket.throttled()
+            logging.warning(f"{urlparse(url).hostname} is throttling us; slowing to {bucket.rate:.2f} requests/s")
+
+    def succeeded(self, url):
+        bucket = self.bucket_for(url)
+        if bucket is not None:
+            bucket.succeeded()
+
+    def stats(self):
+        return {
+            domain: {
+                'rate': round(bucket.rate, 3),
+                'max_rate': bucket.max_rate,
+                'burst': bucket.burst,
+                'waits': bucket.waits,
+                'waited_seconds': round(bucket.waited_seconds, 3),
+                'throttles': bucket.throttles,
+            }
+            for domain, bucket in self._buckets.items()
+        }
+
+
+limiter = RateLimiter()
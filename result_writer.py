@@ -0,0 +1,68 @@
+import csv
+import os
+import threading
+
+from openpyxl import Workbook
+
+COLUMNS = [
+    'movie_name', 'director_name', 'release_year', 'classification', 'run_time',
+    'label_issued_by', 'label_issued_on', 'MR', 'CD', 'link', 'comment',
+]
+
+
+class StreamingResultWriter:
+    """Writes result rows to disk as they arrive, in input order, with constant memory.
+
+    Rows are handed in by input index in any order; a row is written as soon as
+    every row before it has been written, so only out-of-order rows are held in
+    memory. The XLSX uses openpyxl's write-only mode, which spools rows to a
+    temporary file; it is written to `<path>.part` and renamed on `close()`.
+    The optional CSV is flushed row by row.
+    """
+
+    def __init__(self, xlsx_path, csv_path=None):
+        self.xlsx_path = xlsx_path
+        self.csv_path = csv_path
+        self.rows_written = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet('Sheet1')
+        self._sheet.append(COLUMNS)
+
+        self._csv_file = None
+        if csv_path:
+            self._csv_file = open(csv_path + '.part', 'w', newline='', encoding='utf-8')
+            self._csv_writer = csv.writer(self._csv_file)
+            self._csv_writer.writerow(COLUMNS)
+
+    @property
+    def backlog(self):
+        """Rows held in memory until an earlier row arrives."""
+        with self._lock:
+            return len(self._pending)
+
+    def add(self, index, details):
+        with self._lock:
+            self._pending[index] = details
+            while self.rows_written in self._pending:
+                self._write(self._pending.pop(self.rows_written))
+                self.rows_written += 1
+
+    def _write(self, details):
+        row = [details.get(column, '') for column in COLUMNS]
+        self._sheet.append(row)
+        if self._csv_file:
+            self._csv_writer.writerow(row)
+            self._csv_file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._pending:
+                raise RuntimeError(f"{len(self._pending)} rows still waiting on row {self.rows_written}")
+            self._workbook.save(self.xlsx_path + '.part')
+            os.replace(self.xlsx_path + '.part', self.xlsx_path)
+            if self._csv_file:
+                self._csv_file.close()
+                os.replace(self.csv_path + '.part', self.csv_path)
@@ -0,0 +1,59 @@
+import threading
+
+import config
+from lookup_cache import cache as lookup_cache, normalize_text
+from metrics import CACHE_REQUESTS
+
+PERSISTED_SOURCE = 'classificationoffice_search'
+
+
+class SearchCache:
+    """Parsed search results per normalized query, shared by every row of a job.
+
+    Rows with the same title (remakes, the same title across years) are all
+    matched against one fetched result set. Concurrent rows asking for the same
+    query wait for the first fetch instead of issuing their own. With `persist`
+    the result sets are also stored in the lookup cache database so later jobs
+    can reuse them within its TTL; `refresh` skips reading those back.
+    """
+
+    def __init__(self, persist=None, refresh=False):
+        self.persist = config.SEARCH_CACHE_PERSIST if persist is None else persist
+        self.refresh = refresh
+        self.fetches = 0
+        self.hits = 0
+        self._entries = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, query, fetch):
+        key = normalize_text(query)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache='search', result='hit')
+                return self._entries[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self.hits += 1
+                    CACHE_REQUESTS.inc(cache='search', result='hit')
+                    return self._entries[key]
+
+            hit, listings = (False, None)
+            if self.persist and not self.refresh:
+                hit, listings = lookup_cache.get(PERSISTED_SOURCE, key)
+            if not hit:
+                listings = fetch()
+                if self.persist:
+                    lookup_cache.put(PERSISTED_SOURCE, key, listings)
+                with self._lock:
+                    self.fetches += 1
+            CACHE_REQUESTS.inc(cache='search', result='hit' if hit else 'miss')
+
+            with self._lock:
+                self._entries[key] = listings
+                del self._key_locks[key]
+            return listings
@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+
+import config
+
+# Most recent wait durations per step, kept for tuning WAIT_TIMEOUTS
+_durations = defaultdict(lambda: deque(maxlen=1000))
+_timeouts = defaultdict(int)
+_lock = threading.Lock()
+
+
+def record_wait(step, elapsed, satisfied):
+    with _lock:
+        _durations[step].append(elapsed)
+        if not satisfied:
+            _timeouts[step] += 1
+    logging.debug(f"Wait '{step}' {'satisfied' if satisfied else 'timed out'} after {elapsed:.2f}s")
+
+
+def wait_until(condition, step, timeout=None, poll=None):
+    """Poll `condition` until it returns something truthy or the step's timeout expires.
+
+    Exceptions raised by the condition (e.g. stale elements mid-navigation) count
+    as "not ready yet". Returns True if the condition was met.
+    """
+    timeout = timeout if timeout is not None else config.WAIT_TIMEOUTS.get(step, config.WAIT_TIMEOUT_DEFAULT)
+    poll = poll if poll is not None else config.WAIT_POLL_INTERVAL
+    start_time = time.monotonic()
+    while True:
+        try:
+            if condition():
+                record_wait(step, time.monotonic() - start_time, True)
+                return True
+        except Exception:
+            pass
+        elapsed = time.monotonic() - start_time
+        if elapsed >= timeout:
+            record_wait(step, elapsed, False)
+            return False
+        time.sleep(min(poll, timeout - elapsed))
+
+
+def settled(read_value, polls=2):
+    """Build a condition that holds once `read_value()` is non-empty and unchanged for `polls` polls."""
+    state = {'value': None, 'streak': 0}
+
+    def condition():
+        value = read_value()
+        if value and value == state['value']:
+            state['streak'] += 1
+        else:
+            state['value'] = value
+            state['streak'] = 0
+        return state['streak'] >= polls
+
+    return condition
+
+
+def get_wait_stats():
+    with _lock:
+        stats = {}
+        for step, durations in _durations.items():
+            ordered = sorted(durations)
+            stats[step] = {
+                'count': len(ordered),
+                'timeouts': _timeouts[step],
+                'mean': round(sum(ordered) / len(ordered), 3),
+                'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                'max': round(ordered[-1], 3),
+            }
+        return stats